@@ -46,6 +46,10 @@ from .phoneticPunctuationGui import RulesDialog
 from . import phoneticPunctuation as pp
 from . import utils
 from . import frenzy
+from . import benchmark
+from . import profiling
+from . import tracing
+from . import recording
 
 utils.initConfiguration()
 pp.reloadRules()
@@ -58,12 +62,16 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
         super(GlobalPlugin, self).__init__(*args, **kwargs)
         self.createMenu()
         self.injectMonkeyPatches()
+        config.post_configProfileSwitch.register(utils.invalidateEnabledState)
+        config.post_configReset.register(utils.invalidateEnabledState)
 
     def createMenu(self):
         gui.settingsDialogs.NVDASettingsDialog.categoryClasses.append(RulesDialog)
 
     def terminate(self):
         self.restoreMonkeyPatches()
+        config.post_configProfileSwitch.unregister(utils.invalidateEnabledState)
+        config.post_configReset.unregister(utils.invalidateEnabledState)
         gui.settingsDialogs.NVDASettingsDialog.categoryClasses.remove(RulesDialog)
 
     def injectMonkeyPatches(self):
@@ -72,11 +80,31 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
     def  restoreMonkeyPatches(self):
         pp.restoreMonkeyPatches()
 
+    def event_gainFocus(self, obj, nextHandler):
+        utils.updateEnabledState(obj)
+        nextHandler()
+
+    def event_foreground(self, obj, nextHandler):
+        utils.invalidateCurrentContext()
+        nextHandler()
+
+    def event_nameChange(self, obj, nextHandler):
+        if obj == api.getForegroundObject():
+            # Window title changed
+            utils.invalidateCurrentContext()
+        nextHandler()
+
+    def event_documentLoadComplete(self, obj, nextHandler):
+        # URL might have changed
+        utils.invalidateCurrentContext()
+        nextHandler()
+
     @script(description=_("Toggle Earcons and Speech Rules."), gestures=['kb:NVDA+Alt+p'])
     def script_togglePp(self, gesture):
         enabled = utils.getConfig("enabled")
         enabled = not enabled
         utils.setConfig("enabled", enabled)
+        utils.updateEnabledState()
         if enabled:
             msg = _("Earcons and Speech Rules on")
         else:
@@ -95,6 +123,73 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
         ui.message(msg)
         frenzy.updateRules()
 
+    @script(description=_("Report text rules that have been disabled until rules are reloaded because they were too slow."))
+    def script_reportQuarantinedRules(self, gesture):
+        quarantinedRules = pp.quarantinedRules.copy()
+        if len(quarantinedRules) == 0:
+            ui.message(_("No text rules have been disabled"))
+            return
+        lines = [
+            f"{rule.getDisplayName()}: {reason}"
+            for rule, reason in quarantinedRules.items()
+        ]
+        ui.message("\n".join(lines))
+
+    @script(description=_("Benchmark speech processing with current rules and write the report to NVDA log."))
+    def script_runBenchmark(self, gesture):
+        benchmark.runBenchmarkAndLog()
+        ui.message(_("Benchmark report has been written to NVDA log"))
+
+    @script(description=_("Write rules performance report to NVDA log. Press twice to reset performance counters."))
+    def script_reportPerformance(self, gesture):
+        count=scriptHandler.getLastScriptRepeatCount()
+        if count == 0:
+            profiling.logReport()
+            ui.message(_("Performance report has been written to NVDA log"))
+        else:
+            profiling.resetCounters()
+            ui.message(_("Performance counters reset"))
+
+    @script(description=_("Toggle earcon latency tracing. When turned off, latency histograms are written to NVDA log."))
+    def script_toggleLatencyTracing(self, gesture):
+        if tracing.enabled:
+            tracing.setEnabled(False)
+            tracing.logHistograms()
+            ui.message(_("Latency tracing off, histograms have been written to NVDA log"))
+        else:
+            tracing.setEnabled(True)
+            ui.message(_("Latency tracing on"))
+
+    @script(description=_("Toggle debug log of processed utterances. When turned off, debug log is written to NVDA log."))
+    def script_toggleDebugLog(self, gesture):
+        if utils.debug:
+            utils.setDebug(False)
+            utils.dumpDebugLog()
+            ui.message(_("Debug log off, it has been written to NVDA log"))
+        else:
+            utils.debugLog.clear()
+            utils.setDebug(True)
+            ui.message(_("Debug log on"))
+
+    @script(description=_("Toggle recording of speech processed by Earcons and Speech Rules."))
+    def script_toggleRecording(self, gesture):
+        if recording.enabled:
+            count = recording.stopRecording()
+            ui.message(_("Recording stopped, {count} records saved").format(count=count))
+        else:
+            recording.startRecording()
+            ui.message(_("Recording started"))
+
+    @script(description=_("Replay latest speech recording and write the report to NVDA log."))
+    def script_replayRecording(self, gesture):
+        if recording.enabled:
+            ui.message(_("Stop recording first"))
+            return
+        if recording.replayLatestAndLog():
+            ui.message(_("Replay report has been written to NVDA log"))
+        else:
+            ui.message(_("No recordings found"))
+
     @script(description=_("Speak current heading level."), gestures=['kb:NVDA+h'])
     def script_speakHeadingLevel(self, gesture):
         count=scriptHandler.getLastScriptRepeatCount()
@@ -0,0 +1,295 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import addonHandler
+import config
+import controlTypes
+from controlTypes import OutputReason
+import itertools
+import languageHandler
+from logHandler import log
+import speech
+import speech.commands
+import textInfos
+import time
+
+from .common import OtherRule
+from . import frenzy
+from . import phoneticPunctuation as pp
+from . import profiling
+from .commands import PpBeepCommand
+from . import recording
+from . import utils
+addonHandler.initTranslation()
+
+# Benchmark of the speech pipeline with current rules.
+# It runs stages of preSpeak without actually speaking anything, so it can be run at any time.
+# Stages that would change state of the running add-on, such as reloading rules, are in benchmarks/stages.py.
+
+PROSE = [
+    "The quick brown fox jumps over the lazy dog, and then - quite unexpectedly - it runs away!",
+    "Dr. Smith's report (published in 2021) said: \"results are preliminary; more data is needed.\"",
+    "Would you like tea, coffee, or juice? Please let me know by 5 p.m. on Friday.",
+    "In the beginning, there was nothing at all; then, slowly, things started to appear.",
+    "She said it cost $12.50 - about 10% more than last year's price of $11.35.",
+]
+SOURCE_CODE = [
+    "def processRule(speechSequence, rule, symbolLevel):",
+    "    for i, command in enumerate(speechSequence[1:]):",
+    "        if isinstance(command, str) and len(command) > 0:",
+    "result = {key: value for (key, value) in items.items() if value is not None}",
+    "if (a[i] != b[j] && c->next == NULL) { return -1; } // TODO: handle this",
+    "    self.cache[\"key\"] = [x ** 2 for x in range(10)]  # squares",
+]
+LOGS = [
+    "2023-04-05 12:34:56,789 ERROR [main] com.example.Service - Connection refused: host=10.0.0.1:8080",
+    "WARN  [worker-3] /var/log/app/server.log:1234 -> retrying (attempt 3/5) after 250ms...",
+    "{\"level\":\"info\",\"ts\":1680698096.12,\"msg\":\"request\",\"path\":\"/api/v1/users?id=42&sort=asc\"}",
+    "<<< HTTP/1.1 404 Not Found; Content-Type: text/html; charset=UTF-8 >>>",
+    "[DEBUG] a=1, b=2; c=(a+b)*3; d=c/2 => d=4.5 | e=~d & 0xFF ^ 0x0F",
+]
+CORPORA = [
+    ("prose", PROSE),
+    ("source code", SOURCE_CODE),
+    ("logs", LOGS),
+]
+# Number of times each utterance of each corpus is processed
+ITERATIONS = 40
+PERCENTILES = [50, 90, 99]
+# Numbers of adjacent earcons in punctuation dense utterances, such as "----------" or ASCII art
+CHAIN_LENGTHS = [10, 100, 1000]
+
+def getPercentile(sortedValues, percentile):
+    i = min(len(sortedValues) - 1, len(sortedValues) * percentile // 100)
+    return sortedValues[i]
+
+def timeStage(func, inputs):
+    timings = []
+    for arg in inputs:
+        t0 = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+def makeProsodySequence(text):
+    # Balanced, so that prosody stacks are left as they were
+    return [
+        speech.commands.PitchCommand(offset=10),
+        text,
+        speech.commands.RateCommand(offset=-10),
+        text,
+        speech.commands.RateCommand(),
+        speech.commands.PitchCommand(),
+    ]
+
+def makeFormatDenseSequence(text):
+    # Every word changes formatting, as in a document where pitch reflects bold text and heading levels
+    sequence = []
+    for i, word in enumerate(text.split()):
+        sequence.append(speech.commands.PitchCommand(offset=5 + i % 3))
+        if i % 2 == 0:
+            sequence.append(speech.commands.VolumeCommand(offset=-10))
+            sequence.append(word)
+            sequence.append(speech.commands.VolumeCommand())
+        else:
+            sequence.append(word)
+        sequence.append(speech.commands.PitchCommand())
+    return sequence
+
+def makeParagraphFields(text):
+    # Plain text without any formatting that rules would announce, as in plain text editors.
+    # No font size either, since font size rule with prosody command always needs the full path.
+    return [
+        textInfos.FieldCommand("controlStart", textInfos.ControlField(role=controlTypes.Role.PARAGRAPH)),
+        textInfos.FieldCommand("formatChange", textInfos.FormatField({"font-name": "Consolas"})),
+        text,
+        textInfos.FieldCommand("controlEnd", None),
+    ]
+
+def makeTextInfos(fieldLists):
+    # All TextInfos belong to the same object, so that caches are carried from one movement to the next one
+    obj = recording.ReplayObject()
+    infos = []
+    for fields in fieldLists:
+        info = recording.ReplayTextInfo(fields, "".join(field for field in fields if isinstance(field, str)))
+        info.obj = obj
+        infos.append(info)
+    return infos
+
+def formatStageReport(corpusName, stageName, timings, totalChars, unit="chars"):
+    total = sum(timings)
+    sortedTimings = sorted(timings)
+    percentiles = ", ".join([
+        f"p{percentile}={getPercentile(sortedTimings, percentile) * 1000000:.0f}us"
+        for percentile in PERCENTILES
+    ])
+    throughput = totalChars / total if total > 0 else float("inf")
+    return f"{corpusName:12} {stageName:24} {len(timings):5} runs, {total * 1000:8.1f} ms, {throughput:12.0f} {unit}/s, {percentiles}"
+
+def saveSpeechState():
+    # Benchmark runs inside NVDA, so it must leave no trace in quarantine, prosody nesting or performance report.
+    return (
+        dict(pp.quarantinedRules),
+        dict(pp.ruleOverruns),
+        {cls: list(stack) for cls, stack in pp.prosodyStacks.items()},
+        dict(pp.prosodyOffsets),
+        set(pp.displacedProsodies),
+        profiling.saveCounters(),
+    )
+
+def restoreSpeechState(state):
+    quarantinedRules, ruleOverruns, prosodyStacks, prosodyOffsets, displacedProsodies, counters = state
+    for current, saved in [
+        (pp.quarantinedRules, quarantinedRules),
+        (pp.ruleOverruns, ruleOverruns),
+        (pp.prosodyStacks, prosodyStacks),
+        (pp.prosodyOffsets, prosodyOffsets),
+        (pp.displacedProsodies, displacedProsodies),
+    ]:
+        current.clear()
+        current.update(saved)
+    profiling.restoreCounters(counters)
+
+def runBenchmark(iterations=ITERATIONS):
+    """
+    Runs text rules, symbol preprocessing, post processing, prosody fixing and debug logging
+    over a few representative corpora using current rules.
+    Returns report as a list of lines.
+    """
+    symbolLevel = config.conf["speech"]["symbolLevel"]
+    locale = languageHandler.getLanguage()
+    # Debug log stage measures the cost of logging when debug log is off
+    debug = utils.debug
+    utils.setDebug(False)
+    state = saveSpeechState()
+    try:
+        return (
+            runStages(symbolLevel, locale, iterations)
+            + runScalingStages(symbolLevel, iterations)
+            + runEnabledStateStages(iterations)
+            + runTextInfoStages(iterations)
+            + runNoFormattingRulesStages(iterations)
+        )
+    finally:
+        utils.setDebug(debug)
+        restoreSpeechState(state)
+
+def runStages(symbolLevel, locale, iterations):
+    report = []
+    for corpusName, corpus in CORPORA:
+        utterances = list(itertools.chain.from_iterable(itertools.repeat(corpus, iterations)))
+        totalChars = sum(len(utterance) for utterance in utterances)
+        textRulesInputs = [[utterance] for utterance in utterances]
+        textRulesOutputs = [pp.applyTextRules(sequence, symbolLevel) for sequence in textRulesInputs]
+        stages = [
+            ("text rules", lambda sequence: pp.applyTextRules(sequence, symbolLevel), textRulesInputs),
+            ("post processing", lambda sequence: pp.postProcessSynchronousCommands(sequence, symbolLevel), textRulesOutputs),
+            ("fix prosody commands", pp.fixProsodyCommands, [makeProsodySequence(utterance) for utterance in utterances]),
+            ("fix prosody format dense", pp.fixProsodyCommands, [makeFormatDenseSequence(utterance) for utterance in utterances]),
+            # Debug logging must cost nothing when it is off, compare it to formatting the sequence
+            ("debug log off", lambda sequence: utils.mylog("preSpeak", sequence), textRulesOutputs),
+            ("format sequence", str, textRulesOutputs),
+        ]
+        if pp.originalProcessSpeechSymbols is not None:
+            stages.append(("preprocess symbols", lambda text: pp.preProcessSpeechSymbols(locale, text, symbolLevel), utterances))
+        for stageName, func, inputs in stages:
+            timings = timeStage(func, inputs)
+            report.append(formatStageReport(corpusName, stageName, timings, totalChars))
+    return report
+
+def runScalingStages(symbolLevel, iterations):
+    # Earcon chaining should scale linearly with the number of earcons
+    language = speech.getCurrentLanguage()
+    beep = PpBeepCommand(440, 10)
+    report = []
+    for chainLength in CHAIN_LENGTHS:
+        sequence = [beep, " "] * chainLength + ["end"]
+        inputs = [sequence] * iterations
+        timings = timeStage(lambda sequence: pp.chainSynchronousCommands(sequence, language, symbolLevel), inputs)
+        report.append(formatStageReport(f"{chainLength} earcons", "chain earcons", timings, len(sequence) * iterations))
+    return report
+
+def runEnabledStateStages(iterations):
+    # isPhoneticPunctuationEnabled() is called from nearly every patched function.
+    # Uncached stage recomputes enabled state, including blacklist parsing, on every call, as it was done before caching.
+    def uncached(arg):
+        utils.invalidateEnabledState()
+        return utils.isPhoneticPunctuationEnabled()
+    inputs = [None] * (iterations * 100)
+    report = []
+    for stageName, func in [
+        ("enabled check uncached", uncached),
+        ("enabled check cached", lambda arg: utils.isPhoneticPunctuationEnabled()),
+    ]:
+        timings = timeStage(func, inputs)
+        report.append(formatStageReport("enablement", stageName, timings, len(inputs), unit="calls"))
+    return report
+
+def runTextInfoStages(iterations):
+    # Moving by character or word with and without the fast path in new_getTextInfoSpeech.
+    if frenzy.original_getTextInfoSpeech is None:
+        return []
+    text = PROSE[0]
+    units = [
+        ("characters", textInfos.UNIT_CHARACTER, list(text)),
+        ("words", textInfos.UNIT_WORD, [word + " " for word in text.split()]),
+    ]
+    computeCharacterOrWordCache = frenzy.computeCharacterOrWordCache
+    report = []
+    with pp.reloadLock:
+        ruleset = pp.ruleset
+        frenzyRules = ruleset.frenzy
+        # Fast path is not taken when blank rule is enabled, so we publish current rules without it while these stages run.
+        plan = frenzy.FormatPlan.compile(
+            frenzyRules.formatRules,
+            frenzyRules.numericFormatRules,
+            {key: rule for key, rule in frenzyRules.otherRules.items() if key != OtherRule.BLANK},
+        )
+        pp.ruleset = ruleset._replace(frenzy=frenzyRules._replace(formatPlan=plan))
+        try:
+            for corpusName, unit, texts in units:
+                fieldLists = [makeParagraphFields(text) for text in texts] * iterations
+                totalChars = sum(len(text) for text in texts) * iterations
+                for stageName, fastPath in [("text info fast path on", True), ("text info fast path off", False)]:
+                    inputs = makeTextInfos(fieldLists)
+                    if not fastPath:
+                        frenzy.computeCharacterOrWordCache = lambda fields, newCache, plan: None
+                    try:
+                        timings = timeStage(lambda info: list(frenzy.new_getTextInfoSpeech(info, unit=unit, reason=OutputReason.CARET)), inputs)
+                    finally:
+                        frenzy.computeCharacterOrWordCache = computeCharacterOrWordCache
+                    report.append(formatStageReport(corpusName, stageName, timings, totalChars))
+        finally:
+            pp.ruleset = ruleset
+    return report
+
+def runNoFormattingRulesStages(iterations):
+    # When no formatting rules are enabled, new_getTextInfoSpeech delegates to NVDA and should cost next to nothing.
+    if frenzy.original_getTextInfoSpeech is None:
+        return []
+    lines = list(itertools.chain.from_iterable(itertools.repeat(PROSE + LOGS, iterations)))
+    fieldLists = [makeParagraphFields(line) for line in lines]
+    totalChars = sum(len(line) for line in lines)
+    stages = [
+        ("text info NVDA original", frenzy.original_getTextInfoSpeech),
+        ("text info no rules", frenzy.new_getTextInfoSpeech),
+    ]
+    report = []
+    with pp.reloadLock:
+        ruleset = pp.ruleset
+        pp.ruleset = ruleset._replace(frenzy=ruleset.frenzy._replace(formatPlan=frenzy.FormatPlan.compile({}, {}, {})))
+        try:
+            for stageName, func in stages:
+                inputs = makeTextInfos(fieldLists)
+                timings = timeStage(lambda info: list(func(info, unit=textInfos.UNIT_LINE, reason=OutputReason.CARET)), inputs)
+                report.append(formatStageReport("lines", stageName, timings, totalChars))
+        finally:
+            pp.ruleset = ruleset
+    return report
+
+def runBenchmarkAndLog():
+    report = runBenchmark()
+    log.info("Earcons and Speech Rules benchmark:\n" + "\n".join(report))
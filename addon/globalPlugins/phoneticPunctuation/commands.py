@@ -7,6 +7,7 @@
 import addonHandler
 import api
 import bisect
+import collections
 import config
 import controlTypes
 import copy
@@ -42,6 +43,7 @@ import wave
 import wx
 
 from .utils import *
+from . import tracing
 
 try:
     outputDevice=config.conf["speech"]["outputDevice"]
@@ -63,12 +65,14 @@ class PpBeepCommand(PpSynchronousCommand):
         self.left = left
         self.right = right
 
-    def run(self):
+    def run(self, trace=None):
         from NVDAHelper import generateBeep
         hz,length,left,right = self.hz, self.length, self.left, self.right
         bufSize=generateBeep(None,hz,length,left,right)
         buf=create_string_buffer(bufSize)
         generateBeep(buf,hz,length,left,right)
+        if trace is not None:
+            trace.span(tracing.STAGE_FEED)
         ppSynchronousPlayer.feed(buf.raw)
         ppSynchronousPlayer.idle()
 
@@ -82,16 +86,29 @@ class PpBeepCommand(PpSynchronousCommand):
     def terminate(self):
         ppSynchronousPlayer.stop()
 
-class PpWaveFileCommand(PpSynchronousCommand):
-    def __init__(self, fileName, startAdjustment=0, endAdjustment=0, volume=100):
-        self.fileName = fileName
-        self.startAdjustment = startAdjustment
-        self.endAdjustment = endAdjustment
-        self.volume = volume
-        self.f = wave.open(self.fileName,"r")
-        f = self.f
-        if self.f is None:
-            raise RuntimeError("can not open file %s"%self.fileName)
+class DecodedWave(collections.namedtuple("DecodedWave", [
+    "buf",
+    "channels",
+    "sampleRate",
+    "sampleWidth",
+    "nFrames",
+])):
+    """
+    Audio of a wave file with start adjustment and volume applied, along with parameters of the original wave file.
+    """
+    __slots__ = ()
+
+# Decoded wave files, keyed by file name, file modification time and size, start adjustment and volume.
+# This allows to reuse audio buffers when rules are reloaded without decoding wave files again.
+decodedWaveFiles = {}
+def decodeWaveFile(fileName, startAdjustment, volume):
+    st = os.stat(fileName)
+    key = (fileName, st.st_mtime_ns, st.st_size, startAdjustment, volume)
+    try:
+        return key, decodedWaveFiles[key]
+    except KeyError:
+        pass
+    with wave.open(fileName,"r") as f:
         if f.getsampwidth() != 2:
             bits = f.getsampwidth() * 8
             raise RuntimeError(f"We only support 16-bit encoded wav files. '{fileName}' is encoded with {bits} bits per sample.")
@@ -102,30 +119,53 @@ class PpWaveFileCommand(PpSynchronousCommand):
         unpacked = list(unpacked)
         for i in range(n):
             unpacked[i] = int(unpacked[i] * volume/100)
-        if self.startAdjustment > 0:
-            pos = self.startAdjustment * f.getframerate() // 1000
+        if startAdjustment > 0:
+            pos = startAdjustment * f.getframerate() // 1000
             pos *= f.getnchannels()
             unpacked = unpacked[pos:]
             n = len(unpacked)
         packed = struct.pack(f"<{n}h", *unpacked)
-        self.buf = packed
+        decoded = DecodedWave(
+            buf=packed,
+            channels=f.getnchannels(),
+            sampleRate=f.getframerate(),
+            sampleWidth=f.getsampwidth(),
+            nFrames=f.getnframes(),
+        )
+    decodedWaveFiles[key] = decoded
+    return key, decoded
+
+def pruneDecodedWaveFiles(keysInUse):
+    for key in list(decodedWaveFiles.keys()):
+        if key not in keysInUse:
+            del decodedWaveFiles[key]
+
+class PpWaveFileCommand(PpSynchronousCommand):
+    def __init__(self, fileName, startAdjustment=0, endAdjustment=0, volume=100):
+        self.fileName = fileName
+        self.startAdjustment = startAdjustment
+        self.endAdjustment = endAdjustment
+        self.volume = volume
+        # Wave file is only opened while decoding, and not at all if we have already decoded it.
+        self.decodeKey, decoded = decodeWaveFile(fileName, startAdjustment, volume)
+        self.buf = decoded.buf
+        wavMillis = int(1000 * decoded.nFrames / decoded.sampleRate)
+        self.duration = max(0, wavMillis - startAdjustment - endAdjustment)
         try:
             outputDevice=config.conf["speech"]["outputDevice"]
         except KeyError:
             outputDevice=config.conf["audio"]["outputDevice"]
         self.fileWavePlayer = nvwave.WavePlayer(
-            channels=f.getnchannels(),
-            samplesPerSec=f.getframerate(),
-            bitsPerSample=f.getsampwidth()*8,
+            channels=decoded.channels,
+            samplesPerSec=decoded.sampleRate,
+            bitsPerSample=decoded.sampleWidth*8,
             outputDevice=outputDevice,
             wantDucking=False,
             purpose=nvwave.AudioPurpose.SOUNDS,
         )
         
 
-    def run(self):
-        f = self.f
-        f.rewind()
+    def run(self, trace=None):
         if self.startAdjustment < 0:
             time.sleep(-self.startAdjustment / 1000.0)
         elif self.startAdjustment > 0:
@@ -133,15 +173,13 @@ class PpWaveFileCommand(PpSynchronousCommand):
             pass
         fileWavePlayer = self.fileWavePlayer
         fileWavePlayer.stop()
+        if trace is not None:
+            trace.span(tracing.STAGE_FEED)
         fileWavePlayer.feed(self.buf)
         fileWavePlayer.idle()
 
     def getDuration(self):
-        frames = self.f.getnframes()
-        rate = self.f.getframerate()
-        wavMillis = int(1000 * frames / rate)
-        result = wavMillis - self.startAdjustment - self.endAdjustment
-        return max(0, result)
+        return self.duration
 
     def __repr__(self):
         return "PpWaveFileCommand(%r)" % self.fileName
@@ -151,26 +189,39 @@ class PpWaveFileCommand(PpSynchronousCommand):
 
 currentChain = None
 class PpChainCommand(PpSynchronousCommand):
+    # Set by preSpeak when latency tracing is enabled
+    trace = None
+
     def __init__(self, subcommands):
         super().__init__()
         self.subcommands = subcommands
         self.terminated = False
+        # Durations don't change after commands are created, so we only add them up once
+        self.duration = sum([subcommand.getDuration() for subcommand in self.subcommands])
 
     def run(self):
         global currentChain
         currentChain = self
+        if self.trace is not None:
+            self.trace.span(tracing.STAGE_CALLBACK)
         threadPool.add_task(self.threadFunc)
 
     def getDuration(self):
-        return sum([subcommand.getDuration() for subcommand in self.subcommands])
+        return self.duration
 
     def threadFunc(self):
         global currentChain
+        trace = self.trace
+        if trace is not None:
+            trace.span(tracing.STAGE_CHAIN_THREAD)
         timestamp = time.time()
         for subcommand in self.subcommands:
             if self.terminated:
                 return
-            threadPool.add_task(subcommand.run)
+            if trace is None:
+                threadPool.add_task(subcommand.run)
+            else:
+                threadPool.add_task(subcommand.run, trace)
             timestamp += subcommand.getDuration() / 1000
             sleepTime = timestamp - time.time()
             if sleepTime > 0:
@@ -40,6 +40,7 @@ import threading
 from threading import Thread
 import time
 import tones
+import types
 import ui
 import wave
 import wx
@@ -49,6 +50,9 @@ from .utils import *
 from . import utils
 from .commands import *
 from . import phoneticPunctuation as pp
+from . import profiling
+from . import recording
+from . import lookAhead
 from controlTypes import OutputReason
 from config.configFlags import ReportLineIndentation
 
@@ -70,6 +74,7 @@ def new_getObjectPropertiesSpeech(
     patchedAllowedProperties = {}
     if allowedProperties.get('role', False):
         role = obj.role
+        roleRules = pp.ruleset.frenzy.roleRules
         if role in roleRules and roleRules[role].enabled:
             patchedAllowedProperties['role']=False
             #allowedProperties['states']=False
@@ -128,43 +133,51 @@ def monkeyUnpatch():
     speech.speech._getTextInfoSpeech_considerSpelling = original_getTextInfoSpeech_considerSpelling
 
 
-roleRules = None
-stateRules = None
-stateDict = None
-negativeStateDict=None
-formatRules = None
-numericFormatRules = None
-otherRules = None
-def updateRules():
-    global roleRules, stateRules, formatRules, numericFormatRules, otherRules, stateDict, negativeStateDict
+class FrenzyRules(collections.namedtuple("FrenzyRules", [
+    "roleRules",
+    "stateRules",
+    "formatRules",
+    "numericFormatRules",
+    "otherRules",
+    "stateDict",
+    "negativeStateDict",
+    "formatPlan",
+])):
+    """
+    Rules used by functions in this module, compiled by compileRules().
+    This is a part of pp.Ruleset snapshot and must not be modified after it has been published.
+    """
+    __slots__ = ()
+
+def compileRules(rulesByFrenzy):
     roleRules = {
         rule.getFrenzyValue(): rule
-        for rule in pp.rulesByFrenzy[FrenzyType.ROLE]
+        for rule in rulesByFrenzy[FrenzyType.ROLE]
         if rule.enabled
     }
     stateRules = {
         rule.getFrenzyValue(): rule
-        for rule in pp.rulesByFrenzy[FrenzyType.STATE]
+        for rule in rulesByFrenzy[FrenzyType.STATE]
         if rule.enabled
     }
     formatRules = {
         rule.getFrenzyValue(): rule
-        for rule in pp.rulesByFrenzy[FrenzyType.FORMAT]
+        for rule in rulesByFrenzy[FrenzyType.FORMAT]
         if rule.enabled
     }
     numericFormatRules = {
         rule.getFrenzyValue(): rule
-        for rule in pp.rulesByFrenzy[FrenzyType.NUMERIC_FORMAT]
+        for rule in rulesByFrenzy[FrenzyType.NUMERIC_FORMAT]
         if rule.enabled
     }
     otherRules = {
         rule.getFrenzyValue(): rule
-        for rule in pp.rulesByFrenzy[FrenzyType.OTHER_RULE]
+        for rule in rulesByFrenzy[FrenzyType.OTHER_RULE]
         if rule.enabled
     }
     verbose = utils.getConfig("stateVerbose")
     stateDict = {}
-    for rule in pp.rulesByFrenzy[FrenzyType.STATE]:
+    for rule in rulesByFrenzy[FrenzyType.STATE]:
         if not rule.enabled:
             continue
         if                  not verbose and rule.suppressStateClutter:
@@ -175,7 +188,7 @@ def updateRules():
         else:
             stateDict[rule.getFrenzyValue()] = rule.speechCommand
     negativeStateDict = {}
-    for rule in pp.rulesByFrenzy[FrenzyType.NEGATIVE_STATE]:
+    for rule in rulesByFrenzy[FrenzyType.NEGATIVE_STATE]:
         if not rule.enabled:
             continue
         if                  not verbose and rule.suppressStateClutter:
@@ -185,6 +198,106 @@ def updateRules():
             continue
         else:
             negativeStateDict[rule.getFrenzyValue()] = rule.speechCommand
+    return FrenzyRules(
+        roleRules=roleRules,
+        stateRules=stateRules,
+        formatRules=formatRules,
+        numericFormatRules=numericFormatRules,
+        otherRules=otherRules,
+        stateDict=stateDict,
+        negativeStateDict=negativeStateDict,
+        formatPlan=FormatPlan.compile(formatRules, numericFormatRules, otherRules),
+    )
+
+def updateRules():
+    """
+    Recompiles rules of this module, e.g. when state verbosity changes, and publishes them as a part of a new ruleset.
+    """
+    with pp.reloadLock:
+        ruleset = pp.ruleset
+        pp.ruleset = ruleset._replace(frenzy=compileRules(ruleset.rulesByFrenzy))
+
+TEXT_FORMATTING_ATTRIBUTES = [
+    TextFormat.BOLD,
+    TextFormat.ITALIC,
+    TextFormat.UNDERLINE,
+    TextFormat.STRIKETHROUGH,
+]
+
+class FormatPlan(collections.namedtuple("FormatPlan", [
+    "headingRule",
+    "headingLevelRule",
+    "headingLevelRules",
+    "highlightedRule",
+    "fontSizeRule",
+    "fontSizeCommandClass",
+    "textFormattingRules",
+    "blankRule",
+    "processHeadings",
+    "processHighlighted",
+    "processFontSize",
+    "processTextFormatting",
+    "injectsNothing",
+])):
+    """
+    Immutable summary of all formatting rules that new_getTextInfoSpeech needs.
+    It is compiled once in updateRules(), so that we don't have to look up rules on every caret movement.
+    Process* flags tell which features are active, so that work for disabled features can be skipped entirely.
+    When injectsNothing is set, new_getTextInfoSpeech has nothing to add and delegates straight to the original function.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def compile(cls, formatRules, numericFormatRules, otherRules):
+        headingRule = formatRules.get(TextFormat.HEADING, None)
+        headingLevelRule = numericFormatRules.get(NumericTextFormat.HEADING_LEVEL, None)
+        headingLevelRules = {}
+        for level in range(1, 7):
+            hlr = formatRules.get(getattr(TextFormat, f'HEADING{level}'), None)
+            if hlr is not None:
+                headingLevelRules[level] = hlr
+        highlightedRule = formatRules.get(TextFormat.HIGHLIGHTED, None)
+        fontSizeRule = numericFormatRules.get(NumericTextFormat.FONT_SIZE, None)
+        fontSizeCommandClass = None
+        if fontSizeRule is not None:
+            try:
+                samplePreCommand, samplePostCommand = fontSizeRule.getNumericSpeechCommand(10)
+            except ValueError as e:
+                log.error(f"Font size rule is misconfigured and will be ignored: {e}")
+                fontSizeRule = None
+            else:
+                fontSizeCommandClass = type(samplePreCommand)
+        textFormattingRules = tuple(
+            (textFormatting, formatRules[textFormatting])
+            for textFormatting in TEXT_FORMATTING_ATTRIBUTES
+            if textFormatting in formatRules
+        )
+        blankRule = otherRules.get(OtherRule.BLANK, None)
+        processHeadings = headingRule is not None or headingLevelRule is not None or len(headingLevelRules) > 0
+        processHighlighted = highlightedRule is not None
+        processFontSize = fontSizeRule is not None
+        processTextFormatting = len(textFormattingRules) > 0
+        return cls(
+            headingRule=headingRule,
+            headingLevelRule=headingLevelRule,
+            headingLevelRules=types.MappingProxyType(headingLevelRules),
+            highlightedRule=highlightedRule,
+            fontSizeRule=fontSizeRule,
+            fontSizeCommandClass=fontSizeCommandClass,
+            textFormattingRules=textFormattingRules,
+            blankRule=blankRule,
+            processHeadings=processHeadings,
+            processHighlighted=processHighlighted,
+            processFontSize=processFontSize,
+            processTextFormatting=processTextFormatting,
+            injectsNothing=not (
+                processHeadings
+                or processHighlighted
+                or processFontSize
+                or processTextFormatting
+                or blankRule is not None
+            ),
+        )
 
 class FakeTextInfo:
     def __init__(self, info, formatConfig, preventSpellingCharacters, addFakeEmptyText):
@@ -404,6 +517,43 @@ def computeCacheableStateAtEnd(fields):
             result['highlighted'] = True
     return result
 
+def computeCharacterOrWordCache(fields, newCache, plan):
+    """
+    Fast path for moving by character or by word, which are the most frequent keystrokes.
+    Makes a single pass over fields and checks whether any earcons or other commands would be injected.
+    If so, returns None and the caller must fall back to the full heading/format/interval machinery.
+    Otherwise returns the new value of ppCache, identical to what the full path would have computed.
+    """
+    newCache = dict(newCache)
+    fontSizeIsString = plan.fontSizeCommandClass is str
+    for field in fields:
+        if not isinstance(field,textInfos.FieldCommand):
+            continue
+        if field.command == "controlStart":
+            role = field.field.get('role', None)
+            if role == controlTypes.Role.HEADING and plan.processHeadings:
+                return None
+            if role == controlTypes.Role.MARKED_CONTENT and plan.processHighlighted:
+                return None
+        elif field.command == "formatChange":
+            if plan.processFontSize:
+                try:
+                    fontSizeStr = field.field['font-size']
+                    fontSizeStr =re.sub(" ?pt$", "", fontSizeStr)
+                    fontSize = float(fontSizeStr)
+                except (KeyError, ValueError):
+                    newCache.pop('fontSize', None)
+                else:
+                    if not fontSizeIsString or newCache.get('fontSize', None) != fontSize:
+                        return None
+            for textFormatting, fRule in plan.textFormattingRules:
+                value = field.field.get(textFormatting.value, None)
+                if value:
+                    return None
+                newCache[textFormatting.value] = value
+    newCache.update(computeCacheableStateAtEnd(fields))
+    return newCache
+
 original_getTextInfoSpeech = None
 def new_getTextInfoSpeech(
         info,
@@ -415,7 +565,30 @@ def new_getTextInfoSpeech(
         onlyInitialFields = False,
         suppressBlanks = False
 ):
-    if not isPhoneticPunctuationEnabled():
+    generator = doGetTextInfoSpeech(info, useCache, formatConfig, unit, reason, _prefixSpeechCommand, onlyInitialFields, suppressBlanks)
+    if recording.enabled:
+        generator = recording.recordTextInfoSpeech(generator)
+    if isPhoneticPunctuationEnabled() and lookAhead.isEnabled():
+        if reason == OutputReason.SAYALL:
+            generator = lookAhead.prepareTextRules(generator)
+        else:
+            # Caret has moved or something else is being read, so say all text prepared so far won't be spoken
+            lookAhead.discard()
+    return (yield from profiling.timeGenerator("getTextInfoSpeech", generator))
+
+def doGetTextInfoSpeech(
+        info,
+        useCache = True,
+        formatConfig= None,
+        unit = None,
+        reason = OutputReason.QUERY,
+        _prefixSpeechCommand= None,
+        onlyInitialFields = False,
+        suppressBlanks = False
+):
+    plan = pp.ruleset.frenzy.formatPlan
+    if not isPhoneticPunctuationEnabled() or plan.injectsNothing:
+        # Nothing to inject - no need to split text into intervals.
         yield from original_getTextInfoSpeech(
             info,
             useCache ,
@@ -438,17 +611,11 @@ def new_getTextInfoSpeech(
         # For performance reasons, when navigating by paragraph or table cell, spelling errors will not be announced.
         if unit in (textInfos.UNIT_PARAGRAPH, textInfos.UNIT_CELL) and reason == OutputReason.CARET:
             formatConfig["reportSpellingErrors"] = False
-    headingLevelRule = numericFormatRules.get(NumericTextFormat.HEADING_LEVEL, None)
-    headingLevelRules = {
-        level: formatRules.get(
-            getattr(TextFormat, f'HEADING{level}'),
-            None)
-        for level in range(1, 7)
-    }
-    headingRule = formatRules.get(TextFormat.HEADING, None)
-    fontSizeRule = numericFormatRules.get(NumericTextFormat.FONT_SIZE, None)
-    highlightedRule = formatRules.get(TextFormat.HIGHLIGHTED, None)
-    processHeadings = headingLevelRule is not None or headingRule is not None or any(hr is not None for hr in headingLevelRules.values())
+    headingLevelRule = plan.headingLevelRule
+    headingLevelRules = plan.headingLevelRules
+    headingRule = plan.headingRule
+    fontSizeRule = plan.fontSizeRule
+    highlightedRule = plan.highlightedRule
     firstHeadingLevelCommand = None
     preventSpellingCharacters = (
         unit not in  [textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD]
@@ -456,6 +623,8 @@ def new_getTextInfoSpeech(
     )
     fakeTextInfo  = FakeTextInfo(info, formatConfig, preventSpellingCharacters=preventSpellingCharacters, addFakeEmptyText=False)
     fields = fakeTextInfo.fields
+    if recording.enabled:
+        recording.setTextInfoInput(info, fields, useCache, formatConfig, unit, reason, onlyInitialFields, suppressBlanks)
 
     #skip set contains indices where heading controls start and end.
     # We will filter them out before returning from this function as we don't want built-in NVDA logic to double-process headings.
@@ -471,7 +640,31 @@ def new_getTextInfoSpeech(
         newCache['fontSize'] = cache['fontSize']
     except KeyError:
         pass
-    if processHeadings:
+    if unit in [textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD] and plan.blankRule is None:
+        fastCache = computeCharacterOrWordCache(fields, newCache, plan)
+        if fastCache is not None:
+            # Nothing to inject for this character or word - speaking the whole range as a single interval.
+            info.obj.ppCache = fastCache
+            fakeTextInfo.setSkipSet(set())
+            fakeTextInfo.setStartAndEnd(0, len(fields))
+            buffer = []
+            for i, subsequence in enumerate(original_getTextInfoSpeech(
+                fakeTextInfo,
+                useCache ,
+                formatConfig,
+                unit ,
+                reason ,
+                _prefixSpeechCommand,
+                onlyInitialFields,
+                suppressBlanks,
+            )):
+                if i > 0:
+                    yield buffer
+                buffer = subsequence
+            if len(buffer) > 0:
+                yield buffer
+            return
+    if plan.processHeadings:
         headingStarts = list(findAllControlFields(fields))
         headingEnds = [findControlEnd(fields, headingSstart) for headingSstart in headingStarts]
         nHeadings = len(headingStarts)
@@ -550,7 +743,7 @@ def new_getTextInfoSpeech(
                 if postCommand is not None:
                     newCommands[end].insert(0, postCommand)
                     
-    if highlightedRule is not None:
+    if plan.processHighlighted:
         highlightedStarts = list(findAllControlFields(fields, role=controlTypes.Role.MARKED_CONTENT))
         highlightedEnds = [findControlEnd(fields, highlightedSstart) for highlightedSstart in highlightedStarts]
         nHighlighteds = len(highlightedStarts)
@@ -582,10 +775,13 @@ def new_getTextInfoSpeech(
                 if postCommand is not None:
                     newCommands[end].insert(0, postCommand)
 
-    if fontSizeRule is not None:
-        samplePreCommand, samplePostCommand = fontSizeRule.getNumericSpeechCommand(10)
+    if plan.processFontSize:
         # If configured to report heading levels and font size via same prosody  command, then skip headings to avoid interference
-        skipHeadingsForFontSize = headingLevelRule is not None and isinstance(samplePreCommand, speech.commands.BaseProsodyCommand) and type(samplePreCommand) == type(firstHeadingLevelCommand)
+        skipHeadingsForFontSize = (
+            headingLevelRule is not None
+            and issubclass(plan.fontSizeCommandClass, speech.commands.BaseProsodyCommand)
+            and plan.fontSizeCommandClass == type(firstHeadingLevelCommand)
+        )
         for begin, end in findAllFormatFieldBrackets(fields):
             if skipHeadingsForFontSize and any(headingStart < begin < headingEnd for headingStart, headingEnd in zip(headingStarts, headingEnds)):
                 continue
@@ -616,16 +812,7 @@ def new_getTextInfoSpeech(
             if postCommand is not None:
                 newCommands[end].insert(0, postCommand)
     # italic and bold and stuff
-    for textFormatting in [
-        TextFormat.BOLD,
-        TextFormat.ITALIC,
-        TextFormat.UNDERLINE,
-        TextFormat.STRIKETHROUGH,
-    ]:
-        try:
-            fRule = formatRules[textFormatting]
-        except KeyError:
-            continue
+    for textFormatting, fRule in plan.textFormattingRules:
         for begin, end in findAllFormatFieldBrackets(fields):
             value = fields[begin].field.get(textFormatting.value, None)
             prevValue = newCache.get(textFormatting.value, None)
@@ -708,7 +895,10 @@ def new_getTextInfoSpeech(
             start, end = item
             fakeTextInfo.setStartAndEnd(start, end)
             effectiveSuppressBlanks=True if i < lastIntervalIndex or not isBlankSoFar else suppressBlanks
-            if not effectiveSuppressBlanks:
+            # The extra pass with blanks suppressed is only needed to detect blanks for the blank rule.
+            # Skipping it otherwise roughly halves time spent in NVDA per interval, which matters the most during say-all.
+            detectBlank = not effectiveSuppressBlanks and plan.blankRule is not None
+            if detectBlank:
                 # We are not suppressing the blanks
                 # 1. back up cache
                 # 2. Get the sequence with blanks suppressed, so that we can compare it later and decide whether blank is to be spoken
@@ -741,20 +931,18 @@ def new_getTextInfoSpeech(
                 onlyInitialFields,
                 suppressBlanks=effectiveSuppressBlanks,
             ))
-            if not effectiveSuppressBlanks:
-                blankRule = otherRules.get(OtherRule.BLANK, None)
-                if blankRule is not None:
-                    # only compare string commands
-                    sequenceStrings = [s for ss in sequences for s in ss if isinstance(s, str)]
-                    suppressedSequenceStrings = [s for ss in suppressedSequences for s in ss if isinstance(s, str)]
-                    if len(sequenceStrings) == 1 + len(suppressedSequenceStrings) and sequenceStrings[:-1] == suppressedSequenceStrings:
-                        # Blank detected!
-                        blankString = sequenceStrings[-1]
-                        blankCommand = blankRule.speechCommand
-                        for subsequence in sequences:
-                            for i, command in enumerate(subsequence):
-                                if command == blankString:
-                                    subsequence[i] = blankCommand
+            if detectBlank:
+                # only compare string commands
+                sequenceStrings = [s for ss in sequences for s in ss if isinstance(s, str)]
+                suppressedSequenceStrings = [s for ss in suppressedSequences for s in ss if isinstance(s, str)]
+                if len(sequenceStrings) == 1 + len(suppressedSequenceStrings) and sequenceStrings[:-1] == suppressedSequenceStrings:
+                    # Blank detected!
+                    blankString = sequenceStrings[-1]
+                    blankCommand = plan.blankRule.speechCommand
+                    for subsequence in sequences:
+                        for i, command in enumerate(subsequence):
+                            if command == blankString:
+                                subsequence[i] = blankCommand
             isBlank = isBlankSequence(sequences)
             if not isBlank:
                 isBlankSoFar = False
@@ -769,32 +957,44 @@ def new_getTextInfoSpeech(
     if len(buffer) > 0:
         yield buffer
 
-# some random funny Unicode characters
-PROPERTY_SPEECH_SIGNATURE = "🪛🪕🚛"
-PROPERTY_SPEECH_SIGNATURE2 = "🪼‣⁋"
+class RoleMarker(str):
+    """
+    Role text returned by new_getPropertiesSpeech while new_getControlFieldSpeech is running.
+    NVDA either passes it through unchanged, which means we are entering the container,
+    or formats it into a longer string like "out of frame", which means we are exiting the container.
+    Markers are recognized by their type, so we don't need to encode anything in the string itself.
+    Rule is only set when there is a rule configured for this role and we are going to replace it with an earcon.
+    """
+    def __new__(cls, text, rule=None):
+        marker = super().__new__(cls, text)
+        marker.rule = rule
+        return marker
+
+# List of role markers issued during current call to getControlFieldSpeech, or None outside of it.
+roleMarkers = None
+# Frenzy rules used by current call to getControlFieldSpeech, so that the whole call sees the same ruleset even if rules are reloaded meanwhile.
+controlFieldRules = None
 original_getPropertiesSpeech = None
 def new_getPropertiesSpeech(
     reason: OutputReason = OutputReason.QUERY,
     **propertyValues,
 ):
-    if not isPhoneticPunctuationEnabled():
+    if roleMarkers is None or len(propertyValues) != 1 or 'role' not in propertyValues or not isPhoneticPunctuationEnabled():
         return original_getPropertiesSpeech(reason, **propertyValues)
-    if len(propertyValues) == 1:
-        role = propertyValues.get('role', None)
-        if role in roleRules and roleRules[role].enabled:
-            return [f"{PROPERTY_SPEECH_SIGNATURE}{role.name}{PROPERTY_SPEECH_SIGNATURE}"]
-        states = propertyValues.get('states', None)
-            
+    # Only role text is requested. We need to mark it, so that later we can tell whether we're jumping out of container.
+    role = propertyValues['role']
+    roleRules = controlFieldRules.roleRules
+    if role in roleRules and roleRules[role].enabled:
+        marker = RoleMarker(role.displayString, roleRules[role])
+        roleMarkers.append(marker)
+        return [marker]
     result =  original_getPropertiesSpeech(reason, **propertyValues)
-    if 'role' in propertyValues and len(propertyValues) == 1:
-        # Only role text is requested. We need to mark it with signature, so that later we can tell whether we're jumping out of container.
-        # We will strip off the signature downstream.
-        if len(result) == 1:
-            result = [f"{PROPERTY_SPEECH_SIGNATURE2}{result[0]}{PROPERTY_SPEECH_SIGNATURE2}"]
+    if len(result) == 1 and isinstance(result[0], str) and len(result[0]) > 0:
+        marker = RoleMarker(result[0])
+        roleMarkers.append(marker)
+        result = [marker]
     return result
 
-PROPERTY_SPEECH_PATTERN = re.compile(f"{PROPERTY_SPEECH_SIGNATURE}(\w+){PROPERTY_SPEECH_SIGNATURE}")
-PROPERTY_SPEECH_PATTERN2 = re.compile(f"{PROPERTY_SPEECH_SIGNATURE2}(.+){PROPERTY_SPEECH_SIGNATURE2}")
 original_getControlFieldSpeech = None
 def new_getControlFieldSpeech(
     attrs,
@@ -804,56 +1004,43 @@ def new_getControlFieldSpeech(
     extraDetail = False,
     reason = None,
 ):
-    result = original_getControlFieldSpeech(attrs, ancestorAttrs, fieldType, formatConfig, extraDetail, reason)
+    global roleMarkers, controlFieldRules
     if not isPhoneticPunctuationEnabled():
+        return original_getControlFieldSpeech(attrs, ancestorAttrs, fieldType, formatConfig, extraDetail, reason)
+    frenzyRules = pp.ruleset.frenzy
+    previousRoleMarkers, previousControlFieldRules = roleMarkers, controlFieldRules
+    roleMarkers, controlFieldRules = [], frenzyRules
+    try:
+        result = original_getControlFieldSpeech(attrs, ancestorAttrs, fieldType, formatConfig, extraDetail, reason)
+    finally:
+        markers = roleMarkers
+        roleMarkers, controlFieldRules = previousRoleMarkers, previousControlFieldRules
+    if len(markers) == 0:
         return result
+    isExiting = fieldType.startswith("end_")
     result2 = []
-    for i, utterance in enumerate(result):
-        if isinstance(utterance, str):
-            # The differentce between PROPERTY_SPEECH_PATTERN and PROPERTY_SPEECH_PATTERN2 is as follows:
-            # PROPERTY_SPEECH_PATTERN is found when we aim to replace role utterance with an earcone because there is a rule configured for this role.
-            # PROPERTY_SPEECH_PATTERN2 is found when we plan to keep the original role utterance (no rule configured for that role), but we still need to detect "out of container" mode.
-            # When either of these two patterns are perfectly matched, this means we are entering said role.
-            # When the match is not perfect, e.g. extra characters are present, that means that we are exiting the container, and that the string is something like "out of frame" where "out of" might be localized.
-            if m := PROPERTY_SPEECH_PATTERN.match(utterance):
+    for utterance in result:
+        if isinstance(utterance, RoleMarker):
+            # Role text passed through unchanged - this means we are entering said role.
+            if utterance.rule is not None:
                 # Replacing role speech with earcon
-                role = getattr(controlTypes.Role, m.group(1))
-                rule = roleRules[role]
-                command = rule.speechCommand
-                result2.append(command)
-                continue
-            elif m := PROPERTY_SPEECH_PATTERN2.match(utterance):
-                # Just strip off the signature - this is just a role utterance
-                result2.append(m.group(1))
-                continue
-            elif m := PROPERTY_SPEECH_PATTERN.search(utterance):
-                # We have the string, but there are also some other extra characters present.
+                result2.append(utterance.rule.speechCommand)
+            else:
+                result2.append(str(utterance))
+            continue
+        if isExiting and isinstance(utterance, str):
+            marker = next((marker for marker in markers if marker in utterance), None)
+            if marker is not None:
+                # Role text has been formatted into a longer string.
                 # We assume this says something like "Out of frame" - that is we are exiting a container.
                 # Since "out of" is possibly translated to other languages, we can't just match it, so we detect presence of extra characters instead.
-                oocRule = otherRules.get(OtherRule.OUT_OF_CONTAINER, None)
+                oocRule = frenzyRules.otherRules.get(OtherRule.OUT_OF_CONTAINER, None)
                 if oocRule is not None:
-                    command = oocRule.speechCommand
-                    result2.append(command)
+                    result2.append(oocRule.speechCommand)
                     continue
-                else:
-                    role = getattr(controlTypes.Role, m.group(1))
-                    rule = roleRules[role]
-                    command = rule.speechCommand
+                elif marker.rule is not None:
                     result2.append(_("out of"))
-                    result2.append(command)
-                    continue
-            elif m := PROPERTY_SPEECH_PATTERN2.search(utterance):
-                # We have the string, but there are also some other extra characters present.
-                # We assume this says something like "Out of frame" - that is we are exiting a container.
-                # Since "out of" is possibly translated to other languages, we can't just match it, so we detect presence of extra characters instead.
-                oocRule = otherRules.get(OtherRule.OUT_OF_CONTAINER, None)
-                if oocRule is not None:
-                    command = oocRule.speechCommand
-                    result2.append(command)
-                    continue
-                else:
-                    restoredUtterance = PROPERTY_SPEECH_PATTERN2.sub(r'\1', utterance)
-                    result2.append(restoredUtterance)
+                    result2.append(marker.rule.speechCommand)
                     continue
         result2.append(utterance)
     return result2
@@ -871,8 +1058,9 @@ def new_processAndLabelStates(
     # Braille provides custom dictionaries for positive and negative states - we don't mess with Braille.
     # However when the dictionaries are empty, we provide our own custom dictionaries.
     if isPhoneticPunctuationEnabled() and len(positiveStateLabelDict) == 0 and len(negativeStateLabelDict) == 0:
-        positiveStateLabelDict = stateDict
-        negativeStateLabelDict = negativeStateDict
+        frenzyRules = pp.ruleset.frenzy
+        positiveStateLabelDict = frenzyRules.stateDict
+        negativeStateLabelDict = frenzyRules.negativeStateDict
     return  original_processAndLabelStates(
         role,
         states,
@@ -0,0 +1,193 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import collections
+import config
+from logHandler import log
+import queue
+import speech
+import threading
+from threading import Thread
+import time
+
+from . import utils
+from . import profiling
+from . import phoneticPunctuation as pp
+
+# Say all look-ahead.
+# During say all NVDA fetches chunks of text on the main thread one after another,
+# and speech of every chunk only reaches preSpeak after speakWithoutPauses has buffered it up to the end of a sentence.
+# Meanwhile strings of fetched chunks are handed to a background thread that applies text rules to them,
+# so that preSpeak can take prepared results instead of running text rules itself.
+# Only text rule processing is moved off the main thread: fields, speech sequences and foreground context
+# are always obtained on the main thread, while text rules only need the immutable ruleset, strings, symbol level and language.
+# Text rules process every string independently of other strings in the sequence,
+# so prepared strings can be spliced into any sequence that contains them, even after speakWithoutPauses has regrouped it.
+# Python threads don't run in parallel, so time is only saved while the main thread waits outside of Python,
+# such as when it fetches the next chunk from the application.
+# Everything prepared is discarded when speech is cancelled or anything other than say all is read.
+
+# NVDA say all keeps up to 10 lines buffered in the synth
+LOOK_AHEAD_CHUNKS = 10
+PREPARED_STRINGS_SIZE = 1000
+CONTEXT_FILTERS = (
+    ("appName", "applicationFilterRegex"),
+    ("windowTitle", "windowTitleRegex"),
+    ("url", "urlRegex"),
+)
+
+class PreparedString(collections.namedtuple("PreparedString", [
+    "ruleset",
+    "sequence",
+    "seconds",
+])):
+    """
+    Text rules output for a string, along with the ruleset it was computed with and time it took.
+    """
+    __slots__ = ()
+
+lock = threading.Lock()
+# Incremented every time prepared strings are discarded, so that the worker drops results it was computing at that time.
+generation = 0
+# Prepared strings keyed by string, symbol level and language, oldest first.
+prepared = collections.OrderedDict()
+chunks = queue.Queue(maxsize=LOOK_AHEAD_CHUNKS)
+workerThread = None
+
+def isEnabled():
+    return utils.getConfig("sayAllLookAhead")
+
+def getContextKeys(localRuleset):
+    # Context values that enabled text rules filter on; these are looked up on the main thread before handing chunk over.
+    return {
+        key
+        for rule in localRuleset.rulesByFrenzy[pp.FrenzyType.TEXT]
+        if rule.enabled
+        for key, fieldName in CONTEXT_FILTERS
+        if len(getattr(rule, fieldName)) > 0
+    }
+
+def prepareTextRules(generator):
+    """
+    Yields from say all getTextInfoSpeech generator, handing strings of every sequence over to look-ahead worker.
+    Returns whatever generator returns.
+    """
+    symbolLevel = config.conf["speech"]["symbolLevel"]
+    while True:
+        try:
+            sequence = next(generator)
+        except StopIteration as e:
+            return e.value
+        submit(sequence, symbolLevel)
+        yield sequence
+
+def submit(sequence, symbolLevel):
+    global workerThread
+    strings = [command for command in sequence if isinstance(command, str) and len(command) > 0]
+    if len(strings) == 0:
+        return
+    localRuleset = pp.ruleset
+    context = {
+        key: utils.getCurrentContextValue(key)
+        for key in getContextKeys(localRuleset)
+    }
+    try:
+        chunks.put_nowait((generation, localRuleset, strings, symbolLevel, speech.getCurrentLanguage(), context))
+    except queue.Full:
+        # Look-ahead is bounded; strings of this chunk will be processed by preSpeak as usual.
+        profiling.lookAheadCounters.overflows += 1
+        return
+    if workerThread is None:
+        workerThread = Thread(target=workerFunc, name="Earcons and Speech Rules look-ahead", daemon=True)
+        workerThread.start()
+
+def workerFunc():
+    while True:
+        chunkGeneration, localRuleset, strings, symbolLevel, language, context = chunks.get()
+        try:
+            prepareStrings(chunkGeneration, localRuleset, strings, symbolLevel, language, context)
+        except Exception:
+            log.exception("Error in Earcons and Speech Rules say all look-ahead")
+        finally:
+            chunks.task_done()
+
+def prepareStrings(chunkGeneration, localRuleset, strings, symbolLevel, language, context):
+    counters = profiling.lookAheadCounters
+    for s in strings:
+        key = (s, symbolLevel, language)
+        if chunkGeneration != generation:
+            return
+        if key in prepared:
+            continue
+        # Thread time is what main thread would have spent here, not counting time when the worker waited for main thread.
+        t0 = time.thread_time()
+        sequence = pp.applyTextRulesInContext([s], symbolLevel, localRuleset, context.get, language)
+        seconds = time.thread_time() - t0
+        with lock:
+            if chunkGeneration != generation:
+                return
+            prepared[key] = PreparedString(localRuleset, sequence, seconds)
+            counters.prepared += 1
+            if len(prepared) > PREPARED_STRINGS_SIZE:
+                prepared.popitem(last=False)
+
+def hasPreparedStrings():
+    return len(prepared) > 0
+
+def applyTextRules(speechSequence, symbolLevel):
+    """
+    Applies text rules to speech sequence, taking prepared output for strings that look-ahead has already processed.
+    Runs of other commands are processed as usual.
+    """
+    localRuleset = pp.ruleset
+    language = speech.getCurrentLanguage()
+    counters = profiling.lookAheadCounters
+    result = []
+    pending = []
+    for command in speechSequence:
+        entry = None
+        if isinstance(command, str):
+            with lock:
+                entry = prepared.get((command, symbolLevel, language), None)
+            if entry is not None and entry.ruleset is not localRuleset:
+                entry = None
+            if entry is None:
+                counters.misses += 1
+            else:
+                counters.hits += 1
+                counters.seconds += entry.seconds
+        if entry is None:
+            pending.append(command)
+            continue
+        if len(pending) > 0:
+            result.extend(pp.applyTextRulesInContext(pending, symbolLevel, localRuleset, utils.getCurrentContextValue, language))
+            pending = []
+        result.extend(entry.sequence)
+    if len(pending) > 0:
+        result.extend(pp.applyTextRulesInContext(pending, symbolLevel, localRuleset, utils.getCurrentContextValue, language))
+    return result
+
+def discard():
+    """
+    Drops prepared strings and chunks waiting to be prepared, e.g. when speech is cancelled or caret moves.
+    """
+    global generation
+    if len(prepared) == 0 and chunks.unfinished_tasks == 0:
+        return
+    with lock:
+        generation += 1
+        profiling.lookAheadCounters.discarded += len(prepared)
+        prepared.clear()
+    while True:
+        try:
+            chunks.get_nowait()
+        except queue.Empty:
+            break
+        chunks.task_done()
+
+def waitForWorker():
+    # Blocks until every submitted chunk has been prepared or dropped.
+    chunks.join()
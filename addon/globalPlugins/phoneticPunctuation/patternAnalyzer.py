@@ -0,0 +1,201 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import addonHandler
+import collections
+import re
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+import time
+addonHandler.initTranslation()
+
+# Text rules run inside preSpeak on the speech thread for every utterance.
+# A pattern with catastrophic backtracking can freeze NVDA, so we analyze patterns before saving them.
+
+PatternAnalysis = collections.namedtuple("PatternAnalysis", [
+    "warnings",
+    "worstCaseMillis",
+    "worstCaseLength",
+    "exponential",
+    "superLinear",
+])
+
+# Once matching a single adversarial input takes longer than this, we stop growing inputs.
+TIME_BUDGET = 0.05
+# Exponential patterns blow up quickly, so we grow inputs in small steps first.
+INPUT_LENGTHS = list(range(4, 33, 4)) + [48, 64, 96, 128, 256, 512, 1024]
+# Longest input on which exceeding time budget is considered exponential behavior.
+EXPONENTIAL_LENGTH_THRESHOLD = 32
+
+REPEAT_OPS = {"MAX_REPEAT", "MIN_REPEAT"}
+CATEGORY_SAMPLES = {
+    "CATEGORY_DIGIT": "1",
+    "CATEGORY_NOT_DIGIT": "a",
+    "CATEGORY_SPACE": " ",
+    "CATEGORY_NOT_SPACE": "a",
+    "CATEGORY_WORD": "a",
+    "CATEGORY_NOT_WORD": " ",
+}
+
+def isRepeating(op, av):
+    return str(op) in REPEAT_OPS and av[1] > 1
+
+def getFirstChars(subpattern):
+    """
+    Returns a set of characters the given subpattern can start with,
+    or None if we can't tell or if it can start with almost anything.
+    """
+    for op, av in subpattern:
+        name = str(op)
+        if name == "AT":
+            continue
+        if name == "LITERAL":
+            return {chr(av)}
+        if name == "IN":
+            result = set()
+            for itemOp, itemAv in av:
+                itemName = str(itemOp)
+                if itemName == "LITERAL":
+                    result.add(chr(itemAv))
+                elif itemName == "RANGE" and itemAv[1] - itemAv[0] < 256:
+                    result.update(chr(c) for c in range(itemAv[0], itemAv[1] + 1))
+                else:
+                    return None
+            return result
+        if name == "SUBPATTERN":
+            return getFirstChars(av[-1])
+        if name in REPEAT_OPS and av[0] > 0:
+            return getFirstChars(av[2])
+        return None
+    # Empty branch
+    return None
+
+def findRepeatedBranches(body):
+    """
+    Returns alternatives of repeated body, such as a and b in (a|b)+, or None if body is not an alternation.
+    """
+    while len(body) == 1:
+        op, av = body[0]
+        name = str(op)
+        if name == "BRANCH":
+            return av[1]
+        elif name == "SUBPATTERN":
+            body = av[-1]
+        else:
+            return None
+    return None
+
+def findRisks(subpattern, insideRepeat, warnings):
+    for op, av in subpattern:
+        name = str(op)
+        if name in REPEAT_OPS:
+            body = av[2]
+            repeating = isRepeating(op, av)
+            if repeating and insideRepeat:
+                warnings.add(_("Nested quantifiers, such as (a+)+, can take exponential time to match."))
+            branches = findRepeatedBranches(body) if repeating else None
+            if branches is not None:
+                seen = set()
+                for branch in branches:
+                    first = getFirstChars(branch)
+                    if first is None or len(seen & first) > 0:
+                        warnings.add(_("Repeated group contains alternatives that can match the same text, such as (a|a)+."))
+                        break
+                    seen.update(first)
+            findRisks(body, insideRepeat or repeating, warnings)
+        elif name == "SUBPATTERN":
+            findRisks(av[-1], insideRepeat, warnings)
+        elif name == "BRANCH":
+            for branch in av[1]:
+                findRisks(branch, insideRepeat, warnings)
+        elif name in {"ASSERT", "ASSERT_NOT"}:
+            findRisks(av[1], insideRepeat, warnings)
+        elif name in {"ATOMIC_GROUP", "POSSESSIVE_REPEAT"}:
+            # No backtracking into these
+            pass
+
+def collectSampleChars(subpattern, result):
+    for op, av in subpattern:
+        name = str(op)
+        if name == "LITERAL":
+            result.add(chr(av))
+        elif name == "IN":
+            collectSampleChars(av, result)
+        elif name == "RANGE":
+            result.add(chr(av[0]))
+        elif name == "CATEGORY":
+            result.add(CATEGORY_SAMPLES.get(str(av), "a"))
+        elif name == "ANY":
+            result.add("a")
+        elif name in REPEAT_OPS or name == "POSSESSIVE_REPEAT":
+            collectSampleChars(av[2], result)
+        elif name in {"SUBPATTERN", "ATOMIC_GROUP"}:
+            collectSampleChars(av[-1], result)
+        elif name == "BRANCH":
+            for branch in av[1]:
+                collectSampleChars(branch, result)
+        elif name in {"ASSERT", "ASSERT_NOT"}:
+            collectSampleChars(av[1], result)
+
+def getAdversarialPumps(parsed):
+    chars = set()
+    collectSampleChars(parsed, chars)
+    pumps = sorted(chars)
+    if len(pumps) > 1:
+        pumps.append("".join(pumps))
+    return pumps or ["a"]
+
+def timeMatching(regexp, s):
+    t0 = time.perf_counter()
+    for m in regexp.finditer(s):
+        pass
+    return time.perf_counter() - t0
+
+def analyzePattern(pattern):
+    """
+    Analyzes text rule pattern for catastrophic backtracking risks.
+    First we look for risky constructs, such as nested quantifiers.
+    Then we time the pattern on adversarial inputs of growing length,
+    built from characters the pattern can match and followed by a character that is unlikely to match.
+    Raises re.error if pattern is invalid.
+    """
+    regexp = re.compile(pattern)
+    parsed = sre_parse.parse(pattern)
+    warnings = set()
+    findRisks(parsed, False, warnings)
+    worstCase = 0
+    worstCaseLength = 0
+    exponential = False
+    superLinear = False
+    for pump in getAdversarialPumps(parsed):
+        previous = None
+        for length in INPUT_LENGTHS:
+            s = (pump * length)[:length] + "\x00"
+            elapsed = timeMatching(regexp, s)
+            if elapsed > worstCase:
+                worstCase = elapsed
+                worstCaseLength = length
+            if elapsed > TIME_BUDGET:
+                if length <= EXPONENTIAL_LENGTH_THRESHOLD:
+                    exponential = True
+                else:
+                    superLinear = True
+                break
+            if previous is not None and length >= 256 and elapsed > 0.001 and elapsed > 3 * previous:
+                # Doubling input length more than tripled matching time
+                superLinear = True
+            previous = elapsed
+        if exponential:
+            break
+    return PatternAnalysis(
+        warnings=sorted(warnings),
+        worstCaseMillis=worstCase * 1000,
+        worstCaseLength=worstCaseLength,
+        exponential=exponential,
+        superLinear=superLinear,
+    )
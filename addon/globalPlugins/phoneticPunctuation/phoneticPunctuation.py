@@ -24,6 +24,7 @@ from gui.settingsDialogs import SettingsPanel
 import itertools
 import json
 from logHandler import log
+import marshal
 import NVDAHelper
 from NVDAObjects.window import winword
 import nvwave
@@ -35,6 +36,7 @@ from scriptHandler import script, willSayAllResume
 import speech
 import speech.commands
 import struct
+import sys
 import textInfos
 import threading
 from threading import Thread
@@ -49,6 +51,10 @@ from .utils import *
 from .commands import *
 from . import commands
 from . import frenzy
+from . import profiling
+from . import tracing
+from . import recording
+from . import lookAhead
 from config.configFlags import ReportLineIndentation
 import languageHandler
 import shutil
@@ -66,6 +72,11 @@ audioRuleTypes = [
     audioRuleProsody,
 ]
 
+def getWaveFileName(ruleType, wavFile, builtInWavFile):
+    if ruleType == audioRuleBuiltInWave:
+        return os.path.join(getSoundsPath(), builtInWavFile)
+    return wavFile
+
 class MaskedString:
     """
     We convert a string into Masked string to prevent rules from acting on it.
@@ -221,12 +232,8 @@ class AudioRule:
 
     def getSpeechCommand(self):
         if self.ruleType in [audioRuleBuiltInWave, audioRuleWave]:
-            if self.ruleType == audioRuleBuiltInWave:
-                wavFile = os.path.join(getSoundsPath(), self.builtInWavFile)
-            else:
-                wavFile = self.wavFile
             return PpWaveFileCommand(
-                wavFile,
+                getWaveFileName(self.ruleType, self.wavFile, self.builtInWavFile),
                 startAdjustment=self.startAdjustment,
                 endAdjustment=self.endAdjustment,
                 volume=self.volume,
@@ -283,19 +290,30 @@ class AudioRule:
         if not self.enabled:
             yield s
             return
+        counters = profiling.getRuleCounters(self)
+        counters.invocations += 1
+        speechCommand = self.speechCommand
+        matches = 0
+        startTime = time.perf_counter()
         for command in self.processStringInternal(s, *args, **kwargs):
+            if command is speechCommand:
+                matches += 1
             if isinstance(command, str):
                 if len(command) > 0:
                     yield command
             else:
                 yield command
+        counters.seconds += time.perf_counter() - startTime
+        counters.matches += matches
+        if isinstance(speechCommand, PpSynchronousCommand):
+            counters.earcons += matches
 
     def processStringInternal(self, s, symbolLevel, language):
         index = 0
         for match in self.regexp.finditer(s):
             if (
                 not speech.isBlank(match.group(0))
-                and speech.isBlank(speech.processText(language,match.group(0), symbolLevel))
+                and isBlankWhenSpoken(language, match.group(0), symbolLevel)
             ):
                 # Current punctuation level indicates that punctuation mark matched will not be pronounced, therefore skipping it.
                 continue
@@ -312,15 +330,135 @@ class AudioRule:
         yield s[index:]
 
 
-rulesByFrenzy = None
-characterRules = None
-allProsodies = None
+class Ruleset(collections.namedtuple("Ruleset", [
+    "rulesByFrenzy",
+    "characterRules",
+    "frenzy",
+])):
+    """
+    Immutable snapshot of all compiled rules.
+    The whole snapshot is built first and then published with a single assignment to ruleset global,
+    so that speech thread never sees a mix of old and new rules while they are being reloaded.
+    Readers should read ruleset global once and then only use that reference.
+    """
+    __slots__ = ()
+
+ruleset = None
 rulesFileName = os.path.join(globalVars.appArgs.configPath, "earconsAndSpeechRules.json")
 ppRulesFileName = os.path.join(globalVars.appArgs.configPath, "phoneticPunctuationRules.json")
 defaultRulesFileName = os.path.join(os.path.dirname(__file__), "defaultEarconsAndSpeechRules.json")
-def reloadRules():
-    global rulesByFrenzy, characterRules, allProsodies
-    initialAttempt = rulesByFrenzy == None
+rulesSnapshotFileName = os.path.join(globalVars.appArgs.configPath, "earconsAndSpeechRules.snapshot")
+# Bump this whenever the structure of the snapshot changes.
+RULES_SNAPSHOT_FORMAT_VERSION = 2
+
+def getAddonVersion():
+    try:
+        return addonHandler.getCodeAddon().version
+    except Exception:
+        return ""
+
+def getRulesSnapshotHeader():
+    # marshal format is specific to Python version, so it is a part of the header too.
+    return (RULES_SNAPSHOT_FORMAT_VERSION, getAddonVersion(), sys.version)
+
+def loadRulesSnapshot():
+    """
+    Loads decoded audio buffers saved by saveRulesSnapshot() into the decoding cache,
+    so that at startup we don't need to decode every wave file used by rules.
+    Snapshot is silently ignored if it was created by another version of the add-on or Python.
+    Each entry is keyed by wave file modification time and size, so entries for changed wave files are never used.
+    """
+    try:
+        with open(rulesSnapshotFileName, "rb") as f:
+            header, entries = marshal.load(f)
+        if header != getRulesSnapshotHeader():
+            return set()
+        for key, decoded in entries:
+            if not isinstance(key, tuple) or not isinstance(decoded, tuple) or not isinstance(decoded[0], bytes):
+                raise ValueError("Malformed rules snapshot entry")
+            commands.decodedWaveFiles[key] = commands.DecodedWave(*decoded)
+        return {key for key, decoded in entries}
+    except FileNotFoundError:
+        return set()
+    except Exception as e:
+        log.warning(f"Failed to load Earcons and Speech Rules snapshot: {e}")
+        return set()
+
+def saveRulesSnapshot():
+    # marshal only supports plain tuples
+    entries = tuple(
+        (key, tuple(decoded))
+        for key, decoded in commands.decodedWaveFiles.items()
+    )
+    tmpFileName = rulesSnapshotFileName + ".tmp"
+    try:
+        with open(tmpFileName, "wb") as f:
+            marshal.dump((getRulesSnapshotHeader(), entries), f)
+        os.replace(tmpFileName, rulesSnapshotFileName)
+    except OSError as e:
+        log.warning(f"Failed to save Earcons and Speech Rules snapshot: {e}")
+
+# Keys of decoded wave files stored in the snapshot file.
+snapshotKeys = None
+# Modification time and size of rules file when it was last loaded.
+loadedRulesFileStat = None
+# Rules loaded last time, keyed by their JSON definition, so that unchanged rules can be reused on reload.
+compiledRules = {}
+def reloadRules(force=False):
+    """
+    Reloads rules from rules file.
+    If the file hasn't changed since last time, this does nothing.
+    Otherwise only rules whose definition has changed are rebuilt.
+    Pass force=True to rebuild all rules, e.g. when audio output device changes,
+    although wave files are still not decoded again unless they changed on disk.
+    """
+    with reloadLock:
+        doReloadRules(force)
+
+def decodeRulesWaveFiles():
+    """
+    Decodes wave files used by rules in rules file into decoding cache, which is the slow part of reloading rules.
+    Rules whose wave files fail to decode are skipped here; reloadRules() reports them.
+    """
+    global snapshotKeys
+    if snapshotKeys is None:
+        snapshotKeys = loadRulesSnapshot()
+    with open(rulesFileName, "r") as f:
+        ruleDicts = json.load(f)
+    for ruleDict in ruleDicts:
+        ruleType = ruleDict.get("ruleType", None)
+        if ruleType not in [audioRuleBuiltInWave, audioRuleWave]:
+            continue
+        try:
+            commands.decodeWaveFile(
+                getWaveFileName(ruleType, ruleDict.get("wavFile", None), ruleDict.get("builtInWavFile", None)),
+                ruleDict.get("startAdjustment", 0),
+                ruleDict.get("volume", 100),
+            )
+        except Exception:
+            continue
+
+def reloadRulesInBackground(force=False):
+    """
+    Decodes wave files in background thread and then reloads rules on the main thread.
+    Wave players are only created on the main thread, just like NVDA creates its own wave players,
+    while reloadRules() finds decoded audio in the cache and doesn't block the main thread for long.
+    """
+    def threadFunc():
+        try:
+            with reloadLock:
+                decodeRulesWaveFiles()
+        except Exception as e:
+            log.error("Error while decoding Earcons and Speech Rules wave files", e)
+        wx.CallAfter(reloadRules, force)
+    Thread(target=threadFunc, daemon=True).start()
+
+reloadLock = threading.Lock()
+def doReloadRules(force):
+    global ruleset, loadedRulesFileStat, compiledRules, snapshotKeys
+    initialAttempt = ruleset is None
+    if snapshotKeys is None:
+        snapshotKeys = loadRulesSnapshot()
     if initialAttempt and not os.path.exists(rulesFileName):
         # 1. Check if phonetic punctuation rules file exists - if so - then we must have just updated.
         # In this case, migrate from pp and show a dialog box.
@@ -342,33 +480,63 @@ def reloadRules():
         else:
             shutil.copy(defaultRulesFileName, rulesFileName)
         
+    st = os.stat(rulesFileName)
+    rulesFileStat = (st.st_mtime_ns, st.st_size)
+    if not force and not initialAttempt and rulesFileStat == loadedRulesFileStat:
+        return
     rulesConfig = open(rulesFileName, "r").read()
     rulesByFrenzy = {
-        frenzy: []
-        for frenzy in FrenzyType
+        frenzyType: []
+        for frenzyType in FrenzyType
     }
-    allProsodies = set()
     errors = []
+    newCompiledRules = {}
     for ruleDict in json.loads(rulesConfig):
-        try:
-            rule = AudioRule(**ruleDict)
-        except Exception as e:
-            errors.append(e)
-        else:
-            rulesByFrenzy[rule.getFrenzyType()].append(rule)
-            if rule.enabled and rule.ruleType == audioRuleProsody:
-                allProsodies.add(rule.prosodyName)
+        key = json.dumps(ruleDict, sort_keys=True)
+        rule = newCompiledRules.get(key, None)
+        if rule is None and not force:
+            rule = compiledRules.get(key, None)
+        if rule is None:
+            try:
+                rule = AudioRule(**ruleDict)
+            except Exception as e:
+                errors.append(e)
+                continue
+        newCompiledRules[key] = rule
+        rulesByFrenzy[rule.getFrenzyType()].append(rule)
     if len(errors) > 0:
         log.exception(f"Failed to load {len(errors)} audio rules; last exception:", errors[-1])
-    frenzy.updateRules()
+    compiledRules = newCompiledRules
+    loadedRulesFileStat = rulesFileStat
+    # Edited rules are compiled anew, and reused rules get another chance.
+    quarantinedRules.clear()
+    ruleOverruns.clear()
+    profiling.pruneRuleCounters(compiledRules.values())
+    commands.pruneDecodedWaveFiles({
+        rule.speechCommand.decodeKey
+        for rule in compiledRules.values()
+        if isinstance(rule.speechCommand, PpWaveFileCommand)
+    })
+    if set(commands.decodedWaveFiles.keys()) != snapshotKeys:
+        saveRulesSnapshot()
+        snapshotKeys = set(commands.decodedWaveFiles.keys())
+    rulesByFrenzy = {
+        frenzyType: tuple(rules)
+        for frenzyType, rules in rulesByFrenzy.items()
+    }
     characterRules = {
         rule.pattern: rule
         for rule in rulesByFrenzy[FrenzyType.CHARACTER]
         if rule.enabled
     }
+    ruleset = Ruleset(
+        rulesByFrenzy=rulesByFrenzy,
+        characterRules=characterRules,
+        frenzy=frenzy.compileRules(rulesByFrenzy),
+    )
 
 def onPostNvdaStartup():
-    if any([len(rule.urlRegex) > 0 for rule in rulesByFrenzy[FrenzyType.TEXT]]) and not isURLResolutionAvailable():
+    if any([len(rule.urlRegex) > 0 for rule in ruleset.rulesByFrenzy[FrenzyType.TEXT]]) and not isURLResolutionAvailable():
         wx.CallAfter(
             gui.messageBox,
             _(
@@ -391,42 +559,127 @@ originalProcessSpeechSymbols = None
 originalTonesInitialize = None
 def preSpeak(speechSequence, symbolLevel=None, *args, **kwargs):
     global speechCancelledFlag
+    startTime = time.perf_counter()
+    blanknessMemo.clear()
     if isPhoneticPunctuationEnabled():
         if symbolLevel is None:
             symbolLevel=config.conf["speech"]["symbolLevel"]
-        newSequence = speechSequence
-        appName, windowTitle, url = getCurrentContext()
-        for rule in rulesByFrenzy[FrenzyType.TEXT]:
-            if len(rule.applicationFilterRegex) > 0 and not rule._applicationFilterRegex.search(appName):
-                continue
-            if len(rule.windowTitleRegex) > 0 and not rule._windowTitleRegex.search(windowTitle):
-                continue
-            if (
-                len(rule.urlRegex) > 0 
-                and (
-                    url is None
-                    or not rule._urlRegex.search(url)
-                )
-            ):
-                continue
-            newSequence = processRule(newSequence, rule, symbolLevel)
+        newSequence = applyTextRules(speechSequence, symbolLevel)
         resetProsodiesSequence = []
         if speechCancelledFlag:
             resetProsodiesSequence = resetProsodies([])
             speechCancelledFlag = False
         newSequence = postProcessSynchronousCommands(newSequence, symbolLevel)
+        if recording.enabled:
+            recording.recordSpeak(speechSequence, symbolLevel, newSequence)
         newSequence = resetProsodiesSequence + newSequence
+        if tracing.enabled:
+            traceChainCommands(newSequence, startTime)
         #mylog("Speaking!")
-        mylog(str(newSequence))
+        mylog("preSpeak", newSequence)
+        profiling.addStageTime("preSpeak", time.perf_counter() - startTime)
     else:
         newSequence = speechSequence
     newSequence = newSequence + [' '] # Otherwise v2024.2 throws weird Braille Exception + 
     return originalSpeechSpeechSpeak(newSequence, symbolLevel=symbolLevel, *args, **kwargs)
 
+# Whether strings are blank after symbol processing, memoized for the utterance being processed.
+# Text rules, earcon chaining and eloquence fix all check the same strings, such as punctuation marks matched by rules,
+# and speech.processText is relatively expensive.
+# We don't keep the memo across utterances, since user can change symbol pronunciation at any time.
+blanknessMemo = {}
+BLANKNESS_MEMO_SIZE = 10000
+def isBlankWhenSpoken(language, s, symbolLevel):
+    key = (language, symbolLevel, s)
+    counters = profiling.blanknessCounters
+    counters.lookups += 1
+    try:
+        result = blanknessMemo[key]
+        counters.hits += 1
+        return result
+    except KeyError:
+        pass
+    if len(blanknessMemo) >= BLANKNESS_MEMO_SIZE:
+        blanknessMemo.clear()
+    result = speech.isBlank(speech.processText(language, s, symbolLevel))
+    blanknessMemo[key] = result
+    return result
+
+def applyTextRules(speechSequence, symbolLevel):
+    if lookAhead.hasPreparedStrings():
+        return lookAhead.applyTextRules(speechSequence, symbolLevel)
+    return applyTextRulesInContext(speechSequence, symbolLevel, ruleset, getCurrentContextValue, speech.getCurrentLanguage())
+
+def applyTextRulesInContext(speechSequence, symbolLevel, localRuleset, getContextValue, language):
+    """
+    Applies text rules of given ruleset, looking up foreground context with getContextValue.
+    Every string is processed independently of other strings, so a sequence can also be processed in parts.
+    """
+    newSequence = speechSequence
+    ruleTimeBudget = getConfig("ruleTimeBudget") / 1000
+    for rule in localRuleset.rulesByFrenzy[FrenzyType.TEXT]:
+        # Disabled rules must be skipped before checking filters, otherwise they would trigger expensive context lookups.
+        if not rule.enabled or rule in quarantinedRules:
+            continue
+        if len(rule.applicationFilterRegex) > 0 and not rule._applicationFilterRegex.search(getContextValue('appName')):
+            continue
+        if len(rule.windowTitleRegex) > 0 and not rule._windowTitleRegex.search(getContextValue('windowTitle')):
+            continue
+        if len(rule.urlRegex) > 0:
+            url = getContextValue('url')
+            if url is None or not rule._urlRegex.search(url):
+                continue
+        # Thread time doesn't count time when this thread was waiting for other threads, e.g. look-ahead worker or synth.
+        startTime = time.thread_time()
+        newSequence = processRule(newSequence, rule, symbolLevel, language)
+        elapsed = time.thread_time() - startTime
+        if elapsed > ruleTimeBudget:
+            checkOverrun(rule, elapsed, ruleTimeBudget, newSequence)
+        elif len(ruleOverruns) > 0:
+            ruleOverruns.pop(rule, None)
+    return newSequence
+
+def traceChainCommands(sequence, startTime):
+    for command in sequence:
+        if isinstance(command, PpChainCommand):
+            command.trace = tracing.Trace(startTime)
+            command.trace.span(tracing.STAGE_PRESPEAK)
+
+# Text rules that went over time budget, mapped to the reason why.
+# They are skipped until rules are reloaded, so that a single slow rule cannot degrade all speech.
+quarantinedRules = {}
+# Number of consecutive overruns of text rules that have gone over time budget recently.
+ruleOverruns = {}
+# Rule has to go over time budget this many times in a row to be quarantined, so that a single hiccup doesn't disable it.
+QUARANTINE_OVERRUNS = 3
+# Time budget applies to this many characters of text; longer text, such as say all of a long paragraph, gets proportionally more time.
+BUDGET_CHARACTERS = 1000
+
+def checkOverrun(rule, elapsed, ruleTimeBudget, sequence):
+    textLength = sum(len(s) for s in sequence if isinstance(s, str))
+    budget = ruleTimeBudget * max(1, textLength / BUDGET_CHARACTERS)
+    if elapsed <= budget:
+        ruleOverruns.pop(rule, None)
+        return
+    overruns = ruleOverruns.get(rule, 0) + 1
+    if overruns < QUARANTINE_OVERRUNS:
+        ruleOverruns[rule] = overruns
+        return
+    ruleOverruns.pop(rule, None)
+    reason = _("took {elapsed:.0f} ms on {textLength} characters of text {overruns} times in a row, while time budget is {budget:.0f} ms").format(
+        elapsed=elapsed * 1000,
+        textLength=textLength,
+        overruns=overruns,
+        budget=budget * 1000,
+    )
+    quarantinedRules[rule] = reason
+    log.warning(f"Earcons and Speech Rules: disabling text rule '{rule.getDisplayName()}' until rules are reloaded: it {reason}")
+
 speechCancelledFlag = False
 def preCancelSpeech(*args, **kwargs):
     global speechCancelledFlag
     speechCancelledFlag = True
+    lookAhead.discard()
     if isPhoneticPunctuationEnabled():
         localCurrentChain = commands.currentChain
         if localCurrentChain is not None:
@@ -435,12 +688,11 @@ def preCancelSpeech(*args, **kwargs):
     
 
 def preProcessSpeechSymbols(locale, text, level):
-    global rulesByFrenzy
     #mylog(f"preprocess '{text}'")
     n = len(text)
     pattern = "|".join([
         rule.pattern
-        for rule in rulesByFrenzy[FrenzyType.TEXT]
+        for rule in ruleset.rulesByFrenzy[FrenzyType.TEXT]
         if rule.enabled and rule.passThrough
     ])
     pattern = f"({pattern})+"
@@ -478,10 +730,9 @@ def preProcessSpeechSymbols(locale, text, level):
 
 def preTonesInitialize(*args, **kwargs):
     result = originalTonesInitialize(*args, **kwargs)
-    try:
-        reloadRules()
-    except Exception as e:
-        log.error("Error while reloading Earcons and Speech Rules", e)
+    # Audio output device might have changed, so wave players need to be recreated.
+    # New ruleset is published when ready, in the meanwhile speech keeps using the old one.
+    reloadRulesInBackground(force=True)
     return result
 
 highLevelSpeakFunctionNames = {
@@ -587,8 +838,7 @@ def  restoreMonkeyPatches():
     #monkeyUnpatchRestoreProsodyInAllHighLevelSpeakFunctions()
 
 
-def processRule(speechSequence, rule, symbolLevel):
-    language=speech.getCurrentLanguage()
+def processRule(speechSequence, rule, symbolLevel, language):
     newSequence = []
     for command in speechSequence:
         if isinstance(command, str):
@@ -608,33 +858,53 @@ def postProcessSynchronousCommands(speechSequence, symbolLevel):
     We also connect earcons separated by some meaningless commands together into a single chain.
     Examples of meaningless commands are LangChain commands or empty strings.
     """
+    startTime = time.perf_counter()
     language=speech.getCurrentLanguage()
-    def isEmptyString(command):
-        return isinstance(command, str) and speech.isBlank(speech.processText(language,command,symbolLevel))
+    newSequence = unfusedPostProcess(speechSequence, language, symbolLevel)
+    profiling.addStageTime("postProcessSynchronousCommands", time.perf_counter() - startTime)
+    return newSequence
+
+# Commands that don't break a chain of earcons. They are moved after the chain.
+CHAIN_TRANSPARENT_COMMANDS = (speech.commands.LangChangeCommand, MaskedString, speech.commands.BaseProsodyCommand)
+def chainSynchronousCommands(speechSequence, language, symbolLevel):
+    """
+    Replaces adjacent earcons with PpChainCommand followed by a break of the same duration, in a single pass.
+    Empty strings are dropped, both inside and outside of chains.
+    Commands that don't break a chain are emitted right after the chain.
+    """
     newSequence = []
-    excludeIndices = set()
-    for i, command in enumerate(speechSequence):
-        if i in excludeIndices:
-            continue
+    chain = None
+    deferred = []
+    def flushChain():
+        chainCommand = PpChainCommand(chain)
+        duration = chainCommand.getDuration()
+        newSequence.append(chainCommand)
+        newSequence.append(speech.commands.BreakCommand(duration))
+        newSequence.extend(deferred)
+        deferred.clear()
+    for command in speechSequence:
         if isinstance(command, PpSynchronousCommand):
-            chain = [command]
-            for j in range(i+1, len(speechSequence)):
-                cj = speechSequence[j]
-                if isinstance(cj, PpSynchronousCommand):
-                    chain.append(cj)
-                    excludeIndices.add(j)
-                elif isEmptyString(cj):
-                    excludeIndices.add(j)
-                elif isinstance(cj, (speech.commands.LangChangeCommand, MaskedString, speech.commands.BaseProsodyCommand)):
-                    pass
-                else:
-                    break
-            chainCommand = PpChainCommand(chain)
-            duration = chainCommand.getDuration()
-            newSequence.append(chainCommand)
-            newSequence.append(speech.commands.BreakCommand(duration))
-        elif not isEmptyString(command):
+            if chain is None:
+                chain = [command]
+            else:
+                chain.append(command)
+        elif isinstance(command, str) and isBlankWhenSpoken(language, command, symbolLevel):
+            continue
+        elif chain is not None:
+            if isinstance(command, CHAIN_TRANSPARENT_COMMANDS):
+                deferred.append(command)
+            else:
+                flushChain()
+                chain = None
+                newSequence.append(command)
+        else:
             newSequence.append(command)
+    if chain is not None:
+        flushChain()
+    return newSequence
+
+def unfusedPostProcess(speechSequence, language, symbolLevel):
+    newSequence = chainSynchronousCommands(speechSequence, language, symbolLevel)
     newSequence = eloquenceFix(newSequence, language, symbolLevel)
     newSequence = unmaskMaskedStrings(newSequence)
     newSequence = fixProsodyCommands(newSequence)
@@ -648,7 +918,7 @@ def eloquenceFix(speechSequence, language, symbolLevel):
     """
     nonEmpty = [element for element in speechSequence
         if  isinstance(element, str)
-        and not speech.isBlank(speech.processText(language,element,symbolLevel))
+        and not isBlankWhenSpoken(language, element, symbolLevel)
     ]
     if len(nonEmpty) > 0:
         return speechSequence
@@ -672,6 +942,9 @@ def unmaskMaskedStrings(sequence):
 
 prosodyStacks = collections.defaultdict(lambda: [])
 prosodyOffsets = collections.defaultdict(lambda: 0)
+# Prosody command classes, for which we have sent non-default commands to synth since last reset.
+# Only these might be left displaced from default when speech is cancelled.
+displacedProsodies = set()
 def fixProsodyCommands(sequence):
     """
     Prosody commands in NVDA don't support nesting natively.
@@ -681,66 +954,101 @@ def fixProsodyCommands(sequence):
     We can't deal with multiplicative  prosody commands, so we just don't support them here.
     Adjusting prosody offsets in this function so that they support nesting.
     """
-    global prosodyStacks, prosodyOffsets
-    prosodySettings = {}
-    def findProsodySetting(cls):
-        nonlocal prosodySettings
-        try:
-            return prosodySettings[cls]
-        except KeyError:
-            pass
-        clsName  = cls.__name__
-        commandSuffix = 'Command'
-        if not clsName.endswith(commandSuffix):
-            raise RuntimeError(f"Unknown Prosody {clsName}")
-        prosodyName = clsName[:-len(commandSuffix)].lower()
-        for srs in globalVars.settingsRing.settings:
-            if srs.setting.id == prosodyName:
-                prosodySettings[cls] = srs
-                return srs
-        # Well, perhaps current synth doesn't support given prosody.
-        prosodySettings[cls] = None
-        return None
-        
-            
     result = []
-    for i, command in enumerate(sequence):
+    for command in sequence:
         if isinstance(command, speech.commands.BaseProsodyCommand):
-            cls = type(command)
-            if command._multiplier != 1:
-                log.error("Multiplicative prosody commands detected. This is not supported by Earcons and Speech Rules add-on.")
+            command = fixProsodyCommand(command)
+            if command is None:
                 return sequence
-            commandOffset = command._offset
-            if commandOffset == 0:
-                # stack pop
-                if len(prosodyStacks[cls]) == 0:
-                    log.error("Stack underflow during fixProsodyCommands in Earcons and Speech Rules add-on.")
-                    return sequence
-                prosodyOffsets[cls] = prosodyStacks[cls][-1]
-                del prosodyStacks[cls][-1]
-            else:
-                prosodyStacks[cls].append(prosodyOffsets[cls])
-                prosodyOffsets[cls] += commandOffset
-            command = copy.deepcopy(command)
-            # Let's make sure the offset doesn't go beyond (0, 100) interval - otherwise synths will ignore this command.
-            ps = findProsodySetting(cls)
-            if ps is not None:
-                maxOffset = ps.max - ps.value
-                minOffset = ps.min - ps.value
-                effectiveOffset = max(
-                    minOffset,
-                    min(
-                        maxOffset,
-                        prosodyOffsets[cls]
-                    )
-                )
-            else:
-                effectiveOffset = prosodyOffsets[cls]
-            command._offset = effectiveOffset
-            command.isDefault = command._offset == 0
         result.append(command)
     return result
 
+def fixProsodyCommand(command):
+    """
+    Returns prosody command with offset adjusted for nesting, or None if command cannot be nested.
+    """
+    cls = type(command)
+    if command._multiplier != 1:
+        log.error("Multiplicative prosody commands detected. This is not supported by Earcons and Speech Rules add-on.")
+        return None
+    commandOffset = command._offset
+    if commandOffset == 0:
+        # stack pop
+        if len(prosodyStacks[cls]) == 0:
+            log.error("Stack underflow during fixProsodyCommands in Earcons and Speech Rules add-on.")
+            return None
+        prosodyOffsets[cls] = prosodyStacks[cls][-1]
+        del prosodyStacks[cls][-1]
+    else:
+        prosodyStacks[cls].append(prosodyOffsets[cls])
+        prosodyOffsets[cls] += commandOffset
+    # Let's make sure the offset doesn't go beyond (0, 100) interval - otherwise synths will ignore this command.
+    ps = findProsodySetting(cls)
+    if ps is not None:
+        maxOffset = ps.max - ps.value
+        minOffset = ps.min - ps.value
+        effectiveOffset = max(
+            minOffset,
+            min(
+                maxOffset,
+                prosodyOffsets[cls]
+            )
+        )
+    else:
+        effectiveOffset = prosodyOffsets[cls]
+    if effectiveOffset != 0:
+        displacedProsodies.add(cls)
+    elif prosodyOffsets[cls] == 0 and len(prosodyStacks[cls]) == 0:
+        # Prosody is back to default with nothing left to pop, so there is nothing to reset after cancel.
+        displacedProsodies.discard(cls)
+    return getProsodyCommand(cls, effectiveOffset)
+
+# Synth settings ring entries for prosody command classes, kept for the whole session.
+# Settings ring rebuilds its list of settings when synth changes, so we drop the table whenever that list is replaced.
+# Entries give access to min and max values, while current value is read live, since user can change it at any time.
+prosodySettings = {}
+prosodySettingsList = None
+def findProsodySetting(cls):
+    global prosodySettingsList
+    settingsRing = globalVars.settingsRing
+    if settingsRing is None:
+        return None
+    if settingsRing.settings is not prosodySettingsList:
+        prosodySettings.clear()
+        prosodySettingsList = settingsRing.settings
+    try:
+        return prosodySettings[cls]
+    except KeyError:
+        pass
+    clsName  = cls.__name__
+    commandSuffix = 'Command'
+    if not clsName.endswith(commandSuffix):
+        raise RuntimeError(f"Unknown Prosody {clsName}")
+    prosodyName = clsName[:-len(commandSuffix)].lower()
+    for srs in prosodySettingsList:
+        if srs.setting.id == prosodyName:
+            prosodySettings[cls] = srs
+            return srs
+    # Well, perhaps current synth doesn't support given prosody.
+    prosodySettings[cls] = None
+    return None
+
+# Prosody commands are never modified after creation, so we can share them between utterances.
+# Typical rulesets only produce a handful of distinct offsets.
+prosodyCommandCache = {}
+PROSODY_COMMAND_CACHE_SIZE = 1000
+def getProsodyCommand(cls, offset):
+    key = (cls, offset)
+    try:
+        return prosodyCommandCache[key]
+    except KeyError:
+        pass
+    if len(prosodyCommandCache) >= PROSODY_COMMAND_CACHE_SIZE:
+        prosodyCommandCache.clear()
+    command = cls(offset=offset)
+    prosodyCommandCache[key] = command
+    return command
+
 def resetProsodies(sequence):
     """
     Resetting all prosodies at the beginning of each utterance so that previous speech doesn't affect this utterance.
@@ -751,20 +1059,24 @@ def resetProsodies(sequence):
     NVDA appears to have some kind of logic to reset prosody, but it is unreliable and I ddin't track it down.
     So doing a poor man's prosody reset here.
     Also resetting prosodies stack.
+    We only reset prosodies that we might have displaced since last reset, so that utterances after cancel
+    don't carry reset commands for prosodies that haven't been touched.
     """
     global prosodyStacks, prosodyOffsets
     prosodyStacks.clear()
     prosodyOffsets.clear()
-    if len(allProsodies) == 0:
+    if len(displacedProsodies) == 0:
         return sequence
-    return [getProsodyClass(prosodyName)() for prosodyName in allProsodies] + sequence
+    resetCommands = [getProsodyCommand(cls, 0) for cls in displacedProsodies]
+    displacedProsodies.clear()
+    return resetCommands + sequence
 
 original_processSpeechSymbol = None
 def new_processSpeechSymbol(locale, symbol):
     if isPhoneticPunctuationEnabled():
-        rule = characterRules.get(symbol, None)
+        rule = ruleset.characterRules.get(symbol, None)
         if rule is not None:
-            return rule.getSpeechCommand()[0]
+            return rule.speechCommand
     return original_processSpeechSymbol(locale, symbol)
 
 original_getIndentationSpeech = None
@@ -793,10 +1105,10 @@ def new_getIndentationSpeech(indentation, formatConfig):
             indentSequence.append(speech.commands.BeepCommand(speech.speech.IDT_BASE_FREQUENCY, speech.speech.getIndentToneDuration()))
         if speechIndentConfig:
             # mltony change
-            noIndentRule = frenzy.otherRules.get(OtherRule.NO_INDENT, None)
+            noIndentRule = ruleset.frenzy.otherRules.get(OtherRule.NO_INDENT, None)
             if noIndentRule is not None:
                 indentSequence.append(
-                    noIndentRule.getSpeechCommand()[0]
+                    noIndentRule.speechCommand
                 )
             else:
                 indentSequence.append(
@@ -45,6 +45,7 @@ from .phoneticPunctuation import *
 from . import phoneticPunctuation as pp
 from .utils import *
 from . import common
+from . import patternAnalyzer
 
 addonHandler.initTranslation()
 
@@ -371,6 +372,36 @@ class AudioRuleDialog(wx.Dialog):
         self.urlRegexTextCtrl.SetValue(rule.urlRegex)
         self.onType(None)
 
+    def checkPatternPerformance(self, pattern):
+        """
+        Text rules run on every utterance, so a pattern with catastrophic backtracking can freeze NVDA.
+        Refuses patterns that show exponential behavior and asks for confirmation for other risky patterns.
+        Returns True if the pattern can be saved.
+        """
+        analysis = patternAnalyzer.analyzePattern(pattern)
+        worstCase = _("Worst case: {millis:.1f} ms to match {length} characters.").format(
+            millis=analysis.worstCaseMillis,
+            length=analysis.worstCaseLength,
+        )
+        details = "\n".join(analysis.warnings + [worstCase])
+        if analysis.exponential:
+            gui.messageBox(
+                _("This pattern can take exponential time to match and would freeze NVDA. Please change the pattern.") + "\n" + details,
+                _("Dictionary Entry Error"),
+                wx.OK|wx.ICON_ERROR,
+                self,
+            )
+            return False
+        if analysis.superLinear or len(analysis.warnings) > 0:
+            result = gui.messageBox(
+                _("This pattern might be slow on long text and make NVDA sluggish.") + "\n" + details + "\n" + _("Save it anyway?"),
+                _("Dictionary Entry Warning"),
+                wx.YES_NO|wx.ICON_WARNING,
+                self,
+            )
+            return result == wx.YES
+        return True
+
     def makeRule(self):
         if self.frenzyType == FrenzyType.TEXT:
             if not self.patternTextCtrl.GetValue():
@@ -544,7 +575,7 @@ class AudioRuleDialog(wx.Dialog):
                 gui.messageBox(_("Prosody offset cannot be zero."), _("Dictionary Entry Error"), wx.OK|wx.ICON_WARNING, self)
                 self.prosodyOffsetTextCtrl.SetFocus()
                 return
-            mylog(f"prosodyOffset={prosodyOffset}")
+            mylog("prosodyOffset", prosodyOffset)
 
         try:
             result = AudioRule(
@@ -589,6 +620,9 @@ class AudioRuleDialog(wx.Dialog):
 
     def onOk(self,evt):
         rule = self.makeRule()
+        if rule is not None and self.frenzyType == FrenzyType.TEXT and not self.checkPatternPerformance(rule.pattern):
+            self.patternTextCtrl.SetFocus()
+            return
         if rule is not None:
             self.rule = rule
             evt.Skip()
@@ -703,7 +737,8 @@ class RulesDialog(SettingsPanel):
     def makeSettings(self, settingsSizer):
         common.rulesDialogOpen = True
         pp.reloadRules()
-        self.allRules = [rule for frenzyType, rules in pp.rulesByFrenzy.items() for rule in rules]
+        # Copying rules, since they can be toggled in this dialog, while loaded rules are reused by reloadRules().
+        self.allRules = [copy.copy(rule) for frenzyType, rules in pp.ruleset.rulesByFrenzy.items() for rule in rules]
         self.frenzyRules = []
 
         sHelper = gui.guiHelper.BoxSizerHelper(self, sizer=settingsSizer)
@@ -899,7 +934,8 @@ class RulesDialog(SettingsPanel):
             rulesFile.close()
         reloadRules()
 
-        setConfig("applicationsBlacklist",self.applicationsBlacklistEdit.Value)
+        setApplicationsBlacklist(self.applicationsBlacklistEdit.Value)
+        updateEnabledState()
 
     def onDiscard(self):
         common.rulesDialogOpen = False
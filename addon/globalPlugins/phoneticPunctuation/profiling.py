@@ -0,0 +1,126 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import collections
+from logHandler import log
+import time
+
+# Performance counters for rules and for stages of speech processing.
+# Counters are kept in dicts that are replaced as a whole on reset,
+# so resetting is a single assignment no matter how many rules there are.
+
+class RuleCounters:
+    __slots__ = ("invocations", "matches", "seconds", "earcons")
+    def __init__(self):
+        self.invocations = 0
+        self.matches = 0
+        self.seconds = 0.0
+        self.earcons = 0
+
+class StageCounters:
+    __slots__ = ("invocations", "seconds")
+    def __init__(self):
+        self.invocations = 0
+        self.seconds = 0.0
+
+class BlanknessCounters:
+    __slots__ = ("lookups", "hits")
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+
+class LookAheadCounters:
+    __slots__ = ("prepared", "hits", "misses", "discarded", "overflows", "seconds")
+    def __init__(self):
+        self.prepared = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.overflows = 0
+        self.seconds = 0.0
+
+ruleCounters = collections.defaultdict(RuleCounters)
+stageCounters = collections.defaultdict(StageCounters)
+blanknessCounters = BlanknessCounters()
+lookAheadCounters = LookAheadCounters()
+resetTime = time.time()
+
+def resetCounters():
+    global ruleCounters, stageCounters, blanknessCounters, lookAheadCounters, resetTime
+    ruleCounters = collections.defaultdict(RuleCounters)
+    stageCounters = collections.defaultdict(StageCounters)
+    blanknessCounters = BlanknessCounters()
+    lookAheadCounters = LookAheadCounters()
+    resetTime = time.time()
+
+def saveCounters():
+    # Returns current counters and starts new ones, so that e.g. benchmark doesn't show up in performance report.
+    state = (ruleCounters, stageCounters, blanknessCounters, lookAheadCounters, resetTime)
+    resetCounters()
+    return state
+
+def restoreCounters(state):
+    global ruleCounters, stageCounters, blanknessCounters, lookAheadCounters, resetTime
+    ruleCounters, stageCounters, blanknessCounters, lookAheadCounters, resetTime = state
+
+def getRuleCounters(rule):
+    return ruleCounters[rule]
+
+def pruneRuleCounters(rules):
+    # Keeps counters of reused rules only, so that replaced rules and their wave players can be freed on reload.
+    global ruleCounters
+    liveRules = set(rules)
+    ruleCounters = collections.defaultdict(RuleCounters, {
+        rule: counters
+        for rule, counters in ruleCounters.copy().items()
+        if rule in liveRules
+    })
+
+def addStageTime(stageName, seconds):
+    counters = stageCounters[stageName]
+    counters.invocations += 1
+    counters.seconds += seconds
+
+def timeGenerator(stageName, generator):
+    """
+    Yields from generator, only counting time spent inside the generator, but not in its consumer.
+    Returns whatever generator returns.
+    """
+    seconds = 0.0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration as e:
+                return e.value
+            finally:
+                seconds += time.perf_counter() - t0
+            yield item
+    finally:
+        addStageTime(stageName, seconds)
+
+def formatReport():
+    localRuleCounters = ruleCounters.copy()
+    localStageCounters = stageCounters.copy()
+    lines = [f"Earcons and Speech Rules performance report for the last {time.time() - resetTime:.0f} seconds"]
+    lines.append("Stages:")
+    for stageName, counters in sorted(localStageCounters.items(), key=lambda item: -item[1].seconds):
+        average = counters.seconds / counters.invocations if counters.invocations > 0 else 0
+        lines.append(f"    {stageName}: {counters.invocations} calls, {counters.seconds * 1000:.1f} ms total, {average * 1000:.3f} ms average")
+    lines.append(f"Blankness checks: {blanknessCounters.lookups}, {blanknessCounters.hits} duplicate symbol processing calls avoided")
+    lines.append(
+        f"Say all look-ahead: {lookAheadCounters.prepared} strings prepared, {lookAheadCounters.hits} used, {lookAheadCounters.misses} not ready, "
+        f"{lookAheadCounters.discarded} discarded, {lookAheadCounters.overflows} chunks over limit, "
+        f"{lookAheadCounters.seconds * 1000:.1f} ms of text rules taken off speech path"
+    )
+    lines.append("Rules:")
+    for rule, counters in sorted(localRuleCounters.items(), key=lambda item: -item[1].seconds):
+        lines.append(f"    {rule.getDisplayName()}: {counters.seconds * 1000:.1f} ms, {counters.invocations} invocations, {counters.matches} matches, {counters.earcons} earcons")
+    return lines
+
+def logReport():
+    log.info("\n".join(formatReport()))
@@ -0,0 +1,516 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import addonHandler
+import config
+from enum import Enum
+import glob
+import globalVars
+import gzip
+import json
+from logHandler import log
+import os
+import speech
+import speech.commands
+import sys
+import textInfos
+import time
+
+from . import utils
+from . import frenzy
+from . import phoneticPunctuation as pp
+from .commands import PpBeepCommand, PpChainCommand, PpWaveFileCommand
+addonHandler.initTranslation()
+
+# Recording and replaying of real speech traffic.
+# While recording, every sequence entering preSpeak and every field list entering getTextInfoSpeech is saved together with
+# current context, symbol level, language and the output we produced.
+# Replaying pushes recorded inputs through the pipeline again without speaking,
+# measuring time spent and reporting records whose output differs from the recorded one.
+# Recordings are gzipped JSON lines, one record per line, so that they can be shared as regression corpora:
+# opening a recording never runs code from it.
+# Values that JSON can't represent, such as enums, tuples and speech commands, are stored as objects with a single tag key.
+# Earcons are stored by reference, that is by wave file name or beep parameters, and are rebuilt on replay.
+
+RECORDING_FILE_PREFIX = "earconsAndSpeechRules-"
+RECORDING_FILE_EXTENSION = ".recording"
+RECORD_SPEAK = "speak"
+RECORD_TEXT_INFO = "textInfo"
+# How getTextInfoSpeech was told to use NVDA cache of previous calls: not at all, through the object or through explicit state
+USE_CACHE_NONE = "none"
+USE_CACHE_OBJECT = "object"
+USE_CACHE_STATE = "state"
+
+TAG_ENUM = "__enum__"
+TAG_TUPLE = "__tuple__"
+TAG_SET = "__set__"
+TAG_FROZENSET = "__frozenset__"
+TAG_DICT = "__dict__"
+TAG_EARCON = "__earcon__"
+TAG_COMMAND = "__command__"
+TAG_PLACEHOLDER = "__placeholder__"
+TAGS = frozenset([TAG_ENUM, TAG_TUPLE, TAG_SET, TAG_FROZENSET, TAG_DICT, TAG_EARCON, TAG_COMMAND, TAG_PLACEHOLDER])
+EARCON_WAVE = "wave"
+EARCON_BEEP = "beep"
+EARCON_CHAIN = "chain"
+# Only these field classes can be restored from a recording
+FIELD_CLASSES = {
+    "ControlField": textInfos.ControlField,
+    "FormatField": textInfos.FormatField,
+}
+
+enabled = False
+recordingFile = None
+recordingFileName = None
+recordCount = 0
+# Inputs of getTextInfoSpeech call currently in progress, set once field list is known
+pendingTextInfoInput = None
+
+def getRecordingsPath():
+    return globalVars.appArgs.configPath
+
+def getLatestRecordingFileName():
+    fileNames = glob.glob(os.path.join(getRecordingsPath(), RECORDING_FILE_PREFIX + "*" + RECORDING_FILE_EXTENSION))
+    if len(fileNames) == 0:
+        return None
+    return max(fileNames, key=os.path.getmtime)
+
+def startRecording():
+    global enabled, recordingFile, recordingFileName, recordCount
+    recordingFileName = os.path.join(
+        getRecordingsPath(),
+        RECORDING_FILE_PREFIX + time.strftime("%Y%m%d-%H%M%S") + RECORDING_FILE_EXTENSION,
+    )
+    recordingFile = gzip.open(recordingFileName, "wt", encoding="utf-8")
+    recordCount = 0
+    enabled = True
+
+def stopRecording():
+    global enabled, recordingFile, pendingTextInfoInput
+    enabled = False
+    pendingTextInfoInput = None
+    if recordingFile is not None:
+        recordingFile.close()
+        recordingFile = None
+    return recordCount
+
+def writeRecord(record):
+    global recordCount
+    if recordingFile is None:
+        return
+    try:
+        recordingFile.write(json.dumps(record) + "\n")
+        recordCount += 1
+    except Exception:
+        log.error("Earcons and Speech Rules: failed to write recording, stopping recording.", exc_info=True)
+        stopRecording()
+
+def encodeValue(value, dropUnsupported=True):
+    """
+    Returns JSON representation of value, or raises ValueError if it can't be recorded.
+    Dictionary entries that can't be recorded are dropped, unless dropUnsupported is False.
+    """
+    if isinstance(value, Enum):
+        cls = type(value)
+        return {TAG_ENUM: [cls.__module__, cls.__qualname__, value.name]}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, list):
+        return [encodeValue(item, dropUnsupported) for item in value]
+    if isinstance(value, tuple):
+        return {TAG_TUPLE: [encodeValue(item, dropUnsupported) for item in value]}
+    if isinstance(value, frozenset):
+        return {TAG_FROZENSET: [encodeValue(item, dropUnsupported) for item in value]}
+    if isinstance(value, set):
+        return {TAG_SET: [encodeValue(item, dropUnsupported) for item in value]}
+    if isinstance(value, dict):
+        items = []
+        for k, v in value.items():
+            try:
+                items.append((encodeValue(k, dropUnsupported), encodeValue(v, dropUnsupported)))
+            except ValueError:
+                if not dropUnsupported:
+                    raise
+        if all(isinstance(k, str) for k, v in items) and not (len(items) == 1 and items[0][0] in TAGS):
+            return dict(items)
+        return {TAG_DICT: [[k, v] for k, v in items]}
+    raise ValueError(value)
+
+def findClass(moduleName, qualname):
+    # Classes are only looked up in modules that are already loaded, so that a recording cannot make us import anything.
+    obj = sys.modules.get(moduleName, None)
+    for name in qualname.split("."):
+        obj = getattr(obj, name, None)
+    if not isinstance(obj, type):
+        raise ValueError(f"Unknown class {moduleName}.{qualname} in recording")
+    return obj
+
+def decodeValue(value):
+    if isinstance(value, list):
+        return [decodeValue(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) == 1:
+        tag, content = next(iter(value.items()))
+        if tag == TAG_ENUM:
+            moduleName, qualname, name = content
+            cls = findClass(moduleName, qualname)
+            if not issubclass(cls, Enum):
+                raise ValueError(f"{moduleName}.{qualname} is not an enum")
+            return cls[name]
+        elif tag == TAG_TUPLE:
+            return tuple(decodeValue(item) for item in content)
+        elif tag == TAG_SET:
+            return set(decodeValue(item) for item in content)
+        elif tag == TAG_FROZENSET:
+            return frozenset(decodeValue(item) for item in content)
+        elif tag == TAG_DICT:
+            return {decodeValue(k): decodeValue(v) for k, v in content}
+    return {k: decodeValue(v) for k, v in value.items()}
+
+class ReplayPlaceholderCommand(speech.commands.BaseCallbackCommand):
+    """
+    Stands in for a callback command of NVDA or another add-on, which is not replayed, since running it would cause side effects.
+    """
+    def __init__(self, description):
+        super().__init__()
+        self.description = description
+
+    def run(self, *args, **kwargs):
+        pass
+
+    def __repr__(self):
+        return self.description
+
+def encodeCommand(command):
+    """
+    Returns JSON representation of a string or a speech command.
+    Earcons are stored by reference and other commands by their attributes.
+    Foreign callback commands and commands that can't be recorded are replaced with a placeholder.
+    """
+    if isinstance(command, str):
+        return command
+    if isinstance(command, PpWaveFileCommand):
+        return {TAG_EARCON: [EARCON_WAVE, command.fileName, command.startAdjustment, command.endAdjustment, command.volume]}
+    if isinstance(command, PpBeepCommand):
+        return {TAG_EARCON: [EARCON_BEEP, command.hz, command.length, command.left, command.right]}
+    if isinstance(command, PpChainCommand):
+        return {TAG_EARCON: [EARCON_CHAIN, [encodeCommand(subcommand) for subcommand in command.subcommands]]}
+    if isinstance(command, ReplayPlaceholderCommand):
+        return {TAG_PLACEHOLDER: command.description}
+    if not isinstance(command, speech.commands.BaseCallbackCommand):
+        cls = type(command)
+        try:
+            return {TAG_COMMAND: [cls.__module__, cls.__qualname__, encodeValue(vars(command), dropUnsupported=False)]}
+        except (TypeError, ValueError):
+            pass
+    return {TAG_PLACEHOLDER: repr(command)}
+
+def decodeCommand(value, earconCache):
+    """
+    Rebuilds a command stored by encodeCommand().
+    Earcons are kept in earconCache, so that each of them is only built once per replay.
+    """
+    if isinstance(value, str):
+        return value
+    tag, content = next(iter(value.items()))
+    if tag == TAG_EARCON:
+        if content[0] == EARCON_CHAIN:
+            return PpChainCommand([decodeCommand(subcommand, earconCache) for subcommand in content[1]])
+        key = json.dumps(content)
+        try:
+            return earconCache[key]
+        except KeyError:
+            pass
+        if content[0] == EARCON_WAVE:
+            fileName, startAdjustment, endAdjustment, volume = content[1:]
+            command = PpWaveFileCommand(fileName, startAdjustment=startAdjustment, endAdjustment=endAdjustment, volume=volume)
+        elif content[0] == EARCON_BEEP:
+            hz, length, left, right = content[1:]
+            command = PpBeepCommand(hz, length, left=left, right=right)
+        else:
+            raise ValueError(f"Unknown earcon {content[0]} in recording")
+        earconCache[key] = command
+        return command
+    elif tag == TAG_COMMAND:
+        moduleName, qualname, attributes = content
+        cls = findClass(moduleName, qualname)
+        if not issubclass(cls, speech.commands.SpeechCommand) or issubclass(cls, speech.commands.BaseCallbackCommand):
+            raise ValueError(f"{moduleName}.{qualname} is not a speech command that can be replayed")
+        command = cls.__new__(cls)
+        command.__dict__.update(decodeValue(attributes))
+        return command
+    elif tag == TAG_PLACEHOLDER:
+        return ReplayPlaceholderCommand(content)
+    raise ValueError(f"Unknown command {tag} in recording")
+
+def encodeField(field):
+    return [type(field).__name__, encodeValue(dict(field))]
+
+def decodeField(field):
+    className, d = field
+    try:
+        cls = FIELD_CLASSES[className]
+    except KeyError:
+        raise ValueError(f"Unknown field class {className} in recording")
+    return cls(decodeValue(d))
+
+def encodeSpeakTextInfoState(state):
+    if state is None:
+        return None
+    return {
+        "controlFieldStackCache": [encodeField(field) for field in state.controlFieldStackCache],
+        "formatFieldAttributesCache": encodeValue(dict(state.formatFieldAttributesCache)),
+        "indentationCache": state.indentationCache,
+    }
+
+def restoreSpeakTextInfoState(obj, recordedState):
+    state = speech.speech.SpeakTextInfoState(obj)
+    if recordedState is not None:
+        state.controlFieldStackCache = [decodeField(field) for field in recordedState["controlFieldStackCache"]]
+        state.formatFieldAttributesCache = decodeValue(recordedState["formatFieldAttributesCache"])
+        state.indentationCache = recordedState["indentationCache"]
+    return state
+
+def encodeFields(fields):
+    result = []
+    for field in fields:
+        if isinstance(field, textInfos.FieldCommand):
+            if field.field is None:
+                attrs = None
+            else:
+                attrs = encodeField(field.field)
+            result.append([field.command, attrs])
+        elif isinstance(field, str):
+            result.append(field)
+    return result
+
+def decodeFields(fields):
+    result = []
+    for field in fields:
+        if isinstance(field, str):
+            result.append(field)
+            continue
+        command, attrs = field
+        if attrs is not None:
+            attrs = decodeField(attrs)
+        result.append(textInfos.FieldCommand(command, attrs))
+    return result
+
+def describeSequence(sequence):
+    # Outputs are compared by their representation, since commands don't implement equality
+    return [repr(command) for command in sequence]
+
+def makeRecord(recordType, symbolLevel, **kwargs):
+    record = {
+        "type": recordType,
+        "time": time.time(),
+        "context": encodeValue(dict(utils.currentContext)),
+        "symbolLevel": encodeValue(symbolLevel),
+        "language": speech.getCurrentLanguage(),
+    }
+    record.update(kwargs)
+    return record
+
+def recordSpeak(inputSequence, symbolLevel, outputSequence):
+    writeRecord(makeRecord(
+        RECORD_SPEAK,
+        symbolLevel,
+        input=[encodeCommand(command) for command in inputSequence],
+        expected=describeSequence(outputSequence),
+    ))
+
+def setTextInfoInput(info, fields, useCache, formatConfig, unit, reason, onlyInitialFields, suppressBlanks):
+    """
+    Saves inputs of getTextInfoSpeech call, including caches of previous calls that it is going to use,
+    so that replay starts from the same state.
+    """
+    global pendingTextInfoInput
+    if isinstance(useCache, speech.speech.SpeakTextInfoState):
+        useCacheKind = USE_CACHE_STATE
+        speakTextInfoState = useCache
+    elif useCache:
+        useCacheKind = USE_CACHE_OBJECT
+        speakTextInfoState = getattr(info.obj, "_speakTextInfoState", None)
+    else:
+        useCacheKind = USE_CACHE_NONE
+        speakTextInfoState = None
+    pendingTextInfoInput = {
+        "fields": encodeFields(fields),
+        "text": info.text,
+        "ppCache": encodeValue(dict(getattr(info.obj, "ppCache", {}))),
+        "useCache": useCacheKind,
+        "speakTextInfoState": encodeSpeakTextInfoState(speakTextInfoState),
+        "formatConfig": encodeValue(dict(formatConfig)),
+        "unit": unit,
+        "reason": encodeValue(reason),
+        "onlyInitialFields": onlyInitialFields,
+        "suppressBlanks": suppressBlanks,
+    }
+
+def recordTextInfoSpeech(generator):
+    """
+    Yields from getTextInfoSpeech generator and records its inputs and outputs once it is exhausted.
+    """
+    global pendingTextInfoInput
+    pendingTextInfoInput = None
+    expected = []
+    while True:
+        try:
+            sequence = next(generator)
+        except StopIteration as e:
+            result = e.value
+            break
+        expected.append(describeSequence(sequence))
+        yield sequence
+    if enabled and pendingTextInfoInput is not None:
+        writeRecord(makeRecord(
+            RECORD_TEXT_INFO,
+            config.conf["speech"]["symbolLevel"],
+            expected=expected,
+            **pendingTextInfoInput,
+        ))
+    pendingTextInfoInput = None
+    return result
+
+def readRecords(fileName):
+    with gzip.open(fileName, "rt", encoding="utf-8") as f:
+        for line in f:
+            if len(line.strip()) > 0:
+                yield json.loads(line)
+
+class ReplayObject:
+    """
+    Stands in for NVDAObject of replayed TextInfo, only storing our cache.
+    """
+    def __init__(self):
+        self.ppCache = {}
+
+class ReplayTextInfo:
+    """
+    Minimal TextInfo that returns recorded fields.
+    Control and format field speech is computed by NVDA speech functions, as default TextInfo would do.
+    """
+    def __init__(self, fields, text):
+        self.fields = fields
+        self.text = text
+        self.obj = ReplayObject()
+
+    def getTextWithFields(self, formatConfig=None):
+        return list(self.fields)
+
+    def getControlFieldSpeech(self, attrs, ancestorAttrs, fieldType, formatConfig=None, extraDetail=False, reason=None):
+        return speech.speech.getControlFieldSpeech(attrs, ancestorAttrs, fieldType, formatConfig, extraDetail, reason)
+
+    def getFormatFieldSpeech(self, attrs, attrsCache=None, formatConfig=None, reason=None, unit=None, extraDetail=False, initialFormat=False):
+        return speech.speech.getFormatFieldSpeech(attrs, attrsCache, formatConfig, reason, unit, extraDetail, initialFormat)
+
+    def getMathMl(self, field):
+        raise LookupError
+
+def decodeRecord(record, earconCache):
+    """
+    Turns JSON record into inputs of replayRecord(): rebuilds speech commands and fields and restores caches of previous calls.
+    """
+    decoded = {
+        "type": record["type"],
+        "context": decodeValue(record["context"]),
+        "symbolLevel": decodeValue(record["symbolLevel"]),
+    }
+    if record["type"] == RECORD_SPEAK:
+        decoded["input"] = [decodeCommand(command, earconCache) for command in record["input"]]
+    elif record["type"] == RECORD_TEXT_INFO:
+        info = ReplayTextInfo(decodeFields(record["fields"]), record["text"])
+        # Restoring caches of previous calls, so that things like "out of" and repeated formatting are spoken as recorded
+        info.obj.ppCache = decodeValue(record["ppCache"])
+        useCacheKind = record["useCache"]
+        if useCacheKind == USE_CACHE_NONE:
+            useCache = False
+        else:
+            useCache = restoreSpeakTextInfoState(info.obj, record["speakTextInfoState"])
+            if useCacheKind == USE_CACHE_OBJECT:
+                useCache.updateObj()
+                useCache = True
+        decoded.update({
+            "info": info,
+            "useCache": useCache,
+            "formatConfig": decodeValue(record["formatConfig"]),
+            "unit": record["unit"],
+            "reason": decodeValue(record["reason"]),
+            "onlyInitialFields": record["onlyInitialFields"],
+            "suppressBlanks": record["suppressBlanks"],
+        })
+    else:
+        raise ValueError(record["type"])
+    return decoded
+
+def replayRecord(record):
+    utils.currentContext.clear()
+    utils.currentContext.update({
+        'appName': "",
+        'windowTitle': "",
+        'url': None,
+    })
+    utils.currentContext.update(record["context"])
+    symbolLevel = record["symbolLevel"]
+    if record["type"] == RECORD_SPEAK:
+        sequence = pp.applyTextRules(record["input"], symbolLevel)
+        sequence = pp.postProcessSynchronousCommands(sequence, symbolLevel)
+        return describeSequence(sequence)
+    elif record["type"] == RECORD_TEXT_INFO:
+        return [
+            describeSequence(sequence)
+            for sequence in frenzy.doGetTextInfoSpeech(
+                record["info"],
+                useCache=record["useCache"],
+                formatConfig=record["formatConfig"],
+                unit=record["unit"],
+                reason=record["reason"],
+                onlyInitialFields=record["onlyInitialFields"],
+                suppressBlanks=record["suppressBlanks"],
+            )
+        ]
+    else:
+        raise ValueError(record["type"])
+
+def replay(fileName):
+    """
+    Replays recording and returns report as a list of lines.
+    """
+    timings = {RECORD_SPEAK: 0.0, RECORD_TEXT_INFO: 0.0}
+    counts = {RECORD_SPEAK: 0, RECORD_TEXT_INFO: 0}
+    mismatches = []
+    language = speech.getCurrentLanguage()
+    earconCache = {}
+    try:
+        for i, record in enumerate(readRecords(fileName)):
+            try:
+                decoded = decodeRecord(record, earconCache)
+            except Exception as e:
+                mismatches.append(f"Record {i} {record.get('type', None)} cannot be replayed: {e!r}")
+                continue
+            t0 = time.perf_counter()
+            output = replayRecord(decoded)
+            timings[record["type"]] += time.perf_counter() - t0
+            counts[record["type"]] += 1
+            if output != record["expected"]:
+                note = "" if record["language"] == language else f" (recorded with language {record['language']})"
+                mismatches.append(f"Record {i} {record['type']}{note}:\n    expected: {record['expected']}\n    actual:   {output}")
+    finally:
+        utils.invalidateCurrentContext()
+    lines = [f"Earcons and Speech Rules replay of {fileName}:"]
+    for recordType in [RECORD_SPEAK, RECORD_TEXT_INFO]:
+        lines.append(f"    {recordType}: {counts[recordType]} records, {timings[recordType] * 1000:.1f} ms")
+    lines.append(f"    {len(mismatches)} records differ from recorded output")
+    lines.extend(mismatches)
+    return lines
+
+def replayLatestAndLog():
+    fileName = getLatestRecordingFileName()
+    if fileName is None:
+        return False
+    log.info("\n".join(replay(fileName)))
+    return True
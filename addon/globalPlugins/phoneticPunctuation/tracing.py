@@ -0,0 +1,67 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import bisect
+import collections
+from logHandler import log
+import time
+
+# Earcon latency tracing.
+# Each traced utterance gets a Trace object attached to its PpChainCommands.
+# As the earcon travels through synth callback, chain thread and wave player,
+# we record time elapsed since preSpeak received the utterance.
+# When tracing is disabled, no Trace objects are created and the only cost is checking trace attribute for None.
+
+enabled = False
+RING_SIZE = 4096
+# Spans are (stageName, seconds since preSpeak) tuples, only the most recent ones are kept.
+spans = collections.deque(maxlen=RING_SIZE)
+# Upper bounds of histogram buckets in milliseconds
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+# Stages, in order in which earcons go through them
+STAGE_PRESPEAK = "preSpeak processed"
+STAGE_CALLBACK = "synth callback"
+STAGE_CHAIN_THREAD = "chain thread started"
+STAGE_FEED = "wave player feed"
+STAGES = [STAGE_PRESPEAK, STAGE_CALLBACK, STAGE_CHAIN_THREAD, STAGE_FEED]
+
+class Trace:
+    __slots__ = ("startTime",)
+    def __init__(self, startTime):
+        self.startTime = startTime
+
+    def span(self, stageName):
+        spans.append((stageName, time.perf_counter() - self.startTime))
+
+def setEnabled(value):
+    global enabled
+    enabled = value
+    if enabled:
+        spans.clear()
+
+def getHistograms():
+    """
+    Returns a dict from stage name to list of counts in each of HISTOGRAM_BUCKETS plus overflow bucket.
+    """
+    histograms = {
+        stageName: [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        for stageName in STAGES
+    }
+    for stageName, seconds in list(spans):
+        histograms[stageName][bisect.bisect_left(HISTOGRAM_BUCKETS, seconds * 1000)] += 1
+    return histograms
+
+def formatHistograms():
+    headers = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS] + [f">{HISTOGRAM_BUCKETS[-1]}ms"]
+    lines = ["Earcons and Speech Rules earcon latency since preSpeak:"]
+    lines.append(f"{'':24}" + "".join(f"{header:>9}" for header in headers))
+    for stageName, counts in getHistograms().items():
+        lines.append(f"{stageName:24}" + "".join(f"{count:>9}" for count in counts))
+    return lines
+
+def logHistograms():
+    log.info("\n".join(formatHistograms()))
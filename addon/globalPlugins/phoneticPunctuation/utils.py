@@ -7,6 +7,7 @@
 import addonHandler
 import api
 import bisect
+import collections
 import config
 import controlTypes
 import copy
@@ -43,15 +44,29 @@ import wx
 from . import common
 import speech
 
+# Debug log keeps the most recent entries in memory, most notably every utterance processed by preSpeak.
+# Entries are stored as is and only formatted in dumpDebugLog(), so when debug is off logging costs nothing but a flag check.
 debug = False
-if debug:
-    f = open("C:\\Users\\tony\\od\\1.txt", "w", encoding="utf-8")
-    LOG_MUTEX = threading.Lock()
-def mylog(s):
+DEBUG_LOG_SIZE = 200
+debugLog = collections.deque(maxlen=DEBUG_LOG_SIZE)
+def mylog(message, *values):
     if debug:
-        with LOG_MUTEX:
-            print(str(s), file=f)
-            f.flush()
+        debugLog.append((time.time(), threading.current_thread().name, message, values))
+
+def setDebug(value):
+    global debug
+    debug = value
+
+def formatDebugLog():
+    lines = []
+    for timestamp, threadName, message, values in list(debugLog):
+        timeStr = time.strftime("%H:%M:%S", time.localtime(timestamp)) + f".{int(timestamp * 1000) % 1000:03}"
+        valuesStr = " ".join(repr(value) for value in values)
+        lines.append(f"{timeStr} {threadName}: {message} {valuesStr}")
+    return lines
+
+def dumpDebugLog():
+    log.info("Earcons and Speech Rules debug log:\n" + "\n".join(formatDebugLog()))
 
 def myAssert(condition):
     if not condition:
@@ -114,6 +129,8 @@ def initConfiguration():
         "rules" : "string( default='')",
         "applicationsBlacklist" : "string( default='')",
         "stateVerbose" : "boolean( default=True)",
+        "ruleTimeBudget" : "integer( default=100, min=1)",
+        "sayAllLookAhead" : "boolean( default=True)",
     }
     config.conf.spec[phoneticPunctuationConfigKey] = confspec
 
@@ -124,15 +141,53 @@ def getSoundsPath():
     soundsPath = os.path.join(addonPath, "sounds")
     return soundsPath
 
-def isAppBlacklisted():
-    focus = api.getFocusObject()
+# Lowercase names of blacklisted applications, parsed from config only when config changes.
+# It is dropped by invalidateEnabledState() and setApplicationsBlacklist() and parsed again on next use.
+applicationsBlacklist = None
+def parseApplicationsBlacklist(value):
+    return frozenset(
+        name.strip().lower()
+        for name in value.split(",")
+        if len(name.strip()) > 0
+    )
+
+def getApplicationsBlacklist():
+    global applicationsBlacklist
+    if applicationsBlacklist is None:
+        applicationsBlacklist = parseApplicationsBlacklist(getConfig("applicationsBlacklist"))
+    return applicationsBlacklist
+
+def setApplicationsBlacklist(value):
+    global applicationsBlacklist
+    setConfig("applicationsBlacklist", value)
+    applicationsBlacklist = None
+
+def isAppBlacklisted(obj=None):
+    focus = obj or api.getFocusObject()
     appName = focus.appModule.appName
-    if appName.lower() in getConfig("applicationsBlacklist").lower().strip().split(","):
-        return True
-    return False
+    return appName.lower() in getApplicationsBlacklist()
+
+# Cached result of isAppBlacklisted() and "enabled" setting.
+# isPhoneticPunctuationEnabled() is called from nearly every patched function, so we don't want to query focus and parse config every time.
+# It is recomputed in updateEnabledState() on focus change, config profile switch and when toggling the add-on.
+enabledState = None
+def updateEnabledState(obj=None):
+    global enabledState
+    try:
+        enabledState = getConfig("enabled") and not isAppBlacklisted(obj)
+    except AttributeError:
+        # Focus object or its appModule is not available yet
+        enabledState = None
+
+def invalidateEnabledState(*args, **kwargs):
+    global enabledState, applicationsBlacklist
+    enabledState = None
+    applicationsBlacklist = None
 
 def isPhoneticPunctuationEnabled():
-    return not isAppBlacklisted() and  getConfig("enabled") and not  common.rulesDialogOpen
+    if enabledState is None:
+        updateEnabledState()
+    return enabledState and not  common.rulesDialogOpen
 
 def isURLResolutionAvailable():
     try:
@@ -147,18 +202,36 @@ def getCurrentURLSafe():
     except AttributeError:
         return ""
 
-def getCurrentContext():
-    url = getCurrentURLSafe()
-    fg = api.getForegroundObject()
+# Context values are computed lazily, only when some text rule has a filter that needs them.
+# They are cached until invalidateCurrentContext() is called on foreground, window title or document change.
+currentContext = {}
+# Number of times we actually called api.getCurrentURL(), which is expensive.
+urlLookupCount = 0
+def getCurrentContextValue(key):
+    global urlLookupCount
     try:
-        appName = fg.appModule.appName
-    except AttributeError:
-        appName = ''
-    try:
-        windowTitle = fg.name or ""
-    except AttributeError:
-        windowTitle = ""
-    return appName, windowTitle, url
+        return currentContext[key]
+    except KeyError:
+        pass
+    if key == 'url':
+        urlLookupCount += 1
+        value = getCurrentURLSafe()
+    else:
+        fg = api.getForegroundObject()
+        try:
+            if key == 'appName':
+                value = fg.appModule.appName
+            elif key == 'windowTitle':
+                value = fg.name or ""
+            else:
+                raise ValueError(key)
+        except AttributeError:
+            value = ""
+    currentContext[key] = value
+    return value
+
+def invalidateCurrentContext():
+    currentContext.clear()
 
 def getProsodyClass(prosodyName):
     className = prosodyName
@@ -0,0 +1,8 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Headless benchmark harness: runs the add-on's own speech pipeline on Linux or Windows without NVDA.
+# Run it with: python -m benchmarks
@@ -0,0 +1,35 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Command line entry point of the headless benchmark harness.
+# Prints the add-on benchmark report, with throughput and percentiles of every stage,
+# or replays a recording made with "Toggle recording" script.
+#     python -m benchmarks
+#     python -m benchmarks --iterations 200
+#     python -m benchmarks --replay earconsAndSpeechRules-20230405-123456.recording
+
+import argparse
+import sys
+from . import environment
+from . import stages
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark Earcons and Speech Rules speech pipeline without NVDA.")
+    parser.add_argument("--iterations", type=int, default=None, help="Number of times each utterance is processed")
+    parser.add_argument("--config", default=None, help="NVDA config directory with earconsAndSpeechRules.json; default rules are used otherwise")
+    parser.add_argument("--replay", metavar="FILE", default=None, help="Replay recording instead of running benchmark")
+    args = parser.parse_args(argv)
+    addon = environment.loadAddon(args.config)
+    if args.replay is not None:
+        lines = addon.recording.replay(args.replay)
+    else:
+        iterations = args.iterations if args.iterations is not None else addon.benchmark.ITERATIONS
+        lines = addon.benchmark.runBenchmark(iterations) + stages.runHeadlessStages(addon, iterations)
+    print("\n".join(lines))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Loads the add-on outside of NVDA, against stub NVDA modules from nvdaStubs directory.
+# Add-on modules are imported as submodules of a bare phoneticPunctuation package,
+# so that its __init__.py, which needs NVDA GUI, is never run.
+# Everything else is the add-on's own code: rules are loaded from the default rules file
+# and monkey patches are injected into stub NVDA modules, just like GlobalPlugin does.
+
+import builtins
+import importlib
+import json
+import os
+import sys
+import tempfile
+import types
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+STUBS_PATH = os.path.join(BENCHMARKS_PATH, "nvdaStubs")
+ADDON_PATH = os.path.join(os.path.dirname(BENCHMARKS_PATH), "addon", "globalPlugins", "phoneticPunctuation")
+PACKAGE_NAME = "phoneticPunctuation"
+ADDON_MODULES = [
+    "utils",
+    "commands",
+    "phoneticPunctuation",
+    "frenzy",
+    "profiling",
+    "tracing",
+    "recording",
+    "lookAhead",
+    "benchmark",
+]
+
+RULES_FILE_NAME = "earconsAndSpeechRules.json"
+DEFAULT_RULES_FILE_NAME = os.path.join(ADDON_PATH, "defaultEarconsAndSpeechRules.json")
+
+def writeRulesFile(configPath, rules=None):
+    """
+    Writes rules into rules file in configPath, by default rules from the default rules file.
+    Built-in wave file names are stored with Windows path separators, so they are converted to work on any OS.
+    """
+    if rules is None:
+        with open(DEFAULT_RULES_FILE_NAME, "r") as f:
+            rules = json.load(f)
+    rules = [
+        {**rule, "builtInWavFile": rule["builtInWavFile"].replace("\\", os.sep)}
+        if rule.get("builtInWavFile", None) else rule
+        for rule in rules
+    ]
+    fileName = os.path.join(configPath, RULES_FILE_NAME)
+    tmpFileName = fileName + ".tmp"
+    with open(tmpFileName, "w") as f:
+        json.dump(rules, f, indent=4, sort_keys=True)
+    os.replace(tmpFileName, fileName)
+    return fileName
+
+addon = None
+def loadAddon(configPath=None):
+    """
+    Imports add-on modules, loads rules and injects monkey patches, only doing so once per process.
+    Rules and snapshots are kept in configPath, by default in a new temporary directory.
+    Returns a namespace with add-on modules as attributes, e.g. addon.pp and addon.frenzy.
+    """
+    global addon
+    if addon is not None:
+        return addon
+    if STUBS_PATH not in sys.path:
+        sys.path.insert(0, STUBS_PATH)
+    # NVDA installs gettext functions into builtins
+    builtins._ = lambda s: s
+    builtins.ngettext = lambda s, p, n: s if n == 1 else p
+    builtins.pgettext = lambda context, s: s
+    import globalVars
+    globalVars.appArgs.configPath = configPath or tempfile.mkdtemp(prefix="earconsAndSpeechRules-")
+    if not os.path.exists(os.path.join(globalVars.appArgs.configPath, RULES_FILE_NAME)):
+        writeRulesFile(globalVars.appArgs.configPath)
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [ADDON_PATH]
+    sys.modules[PACKAGE_NAME] = package
+    modules = {
+        name: importlib.import_module(f"{PACKAGE_NAME}.{name}")
+        for name in ADDON_MODULES
+    }
+    # Same initialization as in add-on __init__.py and GlobalPlugin.__init__()
+    modules["utils"].initConfiguration()
+    modules["phoneticPunctuation"].reloadRules()
+    modules["phoneticPunctuation"].injectMonkeyPatches()
+    modules["pp"] = modules["phoneticPunctuation"]
+    addon = types.SimpleNamespace(**modules)
+    return addon
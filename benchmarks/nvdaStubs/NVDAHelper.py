@@ -0,0 +1,14 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA NVDAHelper module.
+import tones
+
+def generateBeep(buf, hz, length, left=50, right=50):
+    bufSize = int(tones.SAMPLE_RATE * length / 1000) * 4
+    if buf is not None:
+        buf[:bufSize] = bytes(bufSize)
+    return bufSize
@@ -0,0 +1,17 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA addonHandler module.
+# Translations are installed into builtins by benchmarks.environment, so there is nothing to do here.
+
+def initTranslation():
+    pass
+
+class _CodeAddon:
+    version = "benchmark"
+
+def getCodeAddon():
+    return _CodeAddon()
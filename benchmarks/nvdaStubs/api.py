@@ -0,0 +1,29 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA api module.
+# Focus and foreground object can be replaced by tests.
+import types
+
+focusObject = types.SimpleNamespace(
+    appModule=types.SimpleNamespace(appName="notepad"),
+    name="Untitled - Notepad",
+    treeInterceptor=None,
+)
+foregroundObject = focusObject
+currentURL = ""
+urlLookupCount = 0
+
+def getFocusObject():
+    return focusObject
+
+def getForegroundObject():
+    return foregroundObject
+
+def getCurrentURL():
+    global urlLookupCount
+    urlLookupCount += 1
+    return currentURL
@@ -0,0 +1,66 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA characterProcessing module.
+# Symbols are replaced by their names if their level is not above symbol level, otherwise they are dropped,
+# which is enough to exercise blankness checks of text rules.
+import re
+
+SymbolLevel_NONE = 0
+SymbolLevel_SOME = 100
+SymbolLevel_MOST = 200
+SymbolLevel_ALL = 300
+SymbolLevel_CHAR = 1000
+
+SYMBOLS = {
+    "#": ("number", SymbolLevel_SOME),
+    "$": ("dollar", SymbolLevel_NONE),
+    "%": ("percent", SymbolLevel_SOME),
+    "&": ("and", SymbolLevel_SOME),
+    "*": ("star", SymbolLevel_SOME),
+    "+": ("plus", SymbolLevel_SOME),
+    "/": ("slash", SymbolLevel_SOME),
+    "<": ("less", SymbolLevel_SOME),
+    "=": ("equals", SymbolLevel_SOME),
+    ">": ("greater", SymbolLevel_SOME),
+    "@": ("at", SymbolLevel_SOME),
+    "\\": ("backslash", SymbolLevel_SOME),
+    "^": ("caret", SymbolLevel_SOME),
+    "|": ("bar", SymbolLevel_SOME),
+    "~": ("tilda", SymbolLevel_SOME),
+    ",": ("comma", SymbolLevel_ALL),
+    ";": ("semi", SymbolLevel_MOST),
+    ":": ("colon", SymbolLevel_MOST),
+    "(": ("left paren", SymbolLevel_MOST),
+    ")": ("right paren", SymbolLevel_MOST),
+    "[": ("left bracket", SymbolLevel_MOST),
+    "]": ("right bracket", SymbolLevel_MOST),
+    "{": ("left brace", SymbolLevel_MOST),
+    "}": ("right brace", SymbolLevel_MOST),
+    "!": ("bang", SymbolLevel_ALL),
+    "?": ("question", SymbolLevel_ALL),
+    "\"": ("quote", SymbolLevel_MOST),
+    "-": ("dash", SymbolLevel_MOST),
+    "_": ("line", SymbolLevel_MOST),
+    ".": ("dot", SymbolLevel_ALL),
+    "'": ("tick", SymbolLevel_ALL),
+    "`": ("graav", SymbolLevel_ALL),
+}
+RE_SYMBOLS = re.compile("|".join(re.escape(symbol) for symbol in SYMBOLS))
+
+def processSpeechSymbols(locale, text, level):
+    def replace(m):
+        name, symbolLevel = SYMBOLS[m.group(0)]
+        if level >= symbolLevel:
+            return f" {name} "
+        return " "
+    return RE_SYMBOLS.sub(replace, text)
+
+def processSpeechSymbol(locale, symbol):
+    try:
+        return SYMBOLS[symbol][0]
+    except KeyError:
+        return symbol
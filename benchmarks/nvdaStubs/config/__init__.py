@@ -0,0 +1,60 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA config package.
+# Sections missing from conf are created on first access from defaults in conf.spec, as NVDA does.
+import extensionPoints
+import re
+from . import configFlags
+
+RE_SPEC_DEFAULT = re.compile(r"^\s*(\w+)\(\s*default\s*=\s*('[^']*'|[^,)]*)")
+
+def parseSpecDefault(spec):
+    m = RE_SPEC_DEFAULT.match(spec)
+    if m is None:
+        raise ValueError(spec)
+    specType, value = m.group(1), m.group(2).strip()
+    if specType == "boolean":
+        return value == "True"
+    if specType == "integer":
+        return int(value)
+    if specType == "float":
+        return float(value)
+    return value.strip("'")
+
+class Config(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spec = {}
+
+    def __missing__(self, key):
+        section = {
+            name: parseSpecDefault(spec)
+            for name, spec in self.spec[key].items()
+        }
+        self[key] = section
+        return section
+
+def getDefaultConf():
+    return {
+        "speech": {
+            "symbolLevel": 100,
+            "outputDevice": "default",
+            "delayedCharacterDescriptions": False,
+        },
+        "documentFormatting": {
+            "reportLineIndentation": configFlags.ReportLineIndentation.OFF,
+            "autoLanguageSwitching": True,
+            "reportFontAttributes": True,
+            "reportFontSize": False,
+            "reportHeadings": True,
+            "reportSpellingErrors": True,
+        },
+    }
+
+conf = Config(getDefaultConf())
+post_configProfileSwitch = extensionPoints.Action()
+post_configReset = extensionPoints.Action()
@@ -0,0 +1,39 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA controlTypes package.
+from enum import Enum
+from . import role, state
+from .role import Role
+from .state import State
+
+class OutputReason(Enum):
+    FOCUS = "focus"
+    FOCUSENTERED = "focusEntered"
+    MOUSE = "mouse"
+    QUERY = "query"
+    CHANGE = "change"
+    MESSAGE = "message"
+    SAYALL = "sayAll"
+    CARET = "caret"
+    ONLYCACHE = "onlyCache"
+    QUICKNAV = "quickNav"
+
+def processAndLabelStates(
+    role,
+    states,
+    reason,
+    positiveStates=None,
+    negativeStates=None,
+    positiveStateLabelDict={},
+    negativeStateLabelDict={},
+):
+    labels = []
+    for state in sorted(positiveStates if positiveStates is not None else states):
+        labels.append(positiveStateLabelDict.get(state, state.displayString))
+    for state in sorted(negativeStates or ()):
+        labels.append(negativeStateLabelDict.get(state, "not " + state.displayString))
+    return labels
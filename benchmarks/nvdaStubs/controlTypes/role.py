@@ -0,0 +1,41 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA controlTypes.role module, only roles that add-on rules and benchmarks refer to.
+from enum import IntEnum
+
+class Role(IntEnum):
+    UNKNOWN = 0
+    WINDOW = 1
+    BUTTON = 9
+    RADIOBUTTON = 10
+    CHECKBOX = 11
+    EDITABLETEXT = 12
+    COMBOBOX = 13
+    LIST = 14
+    LISTITEM = 15
+    LINK = 19
+    HEADING = 40
+    DOCUMENT = 52
+    PARAGRAPH = 56
+    MENUITEM = 67
+    SLIDER = 37
+    SPLITBUTTON = 95
+    MENUBUTTON = 96
+    TABLE = 27
+    FRAME = 72
+    MARKED_CONTENT = 157
+
+    @property
+    def displayString(self):
+        return _roleLabels[self]
+
+_roleLabels = {
+    role: role.name.lower().replace("_", " ")
+    for role in Role
+}
+_roleLabels[Role.EDITABLETEXT] = "edit"
+_roleLabels[Role.MARKED_CONTENT] = "highlighted"
@@ -0,0 +1,26 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA controlTypes.state module, only states that add-on rules and benchmarks refer to.
+from enum import IntEnum
+
+class State(IntEnum):
+    FOCUSED = 0x4
+    SELECTED = 0x8
+    CHECKED = 0x20
+    EDITABLE = 0x10000
+    MULTILINE = 0x400000
+    AUTOCOMPLETE = 0x1000000000
+    HASPOPUP_LIST = 0x40000000000
+
+    @property
+    def displayString(self):
+        return _stateLabels[self]
+
+_stateLabels = {
+    state: state.name.lower().replace("_", " ")
+    for state in State
+}
@@ -0,0 +1,21 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA extensionPoints module.
+
+class Action:
+    def __init__(self):
+        self.handlers = []
+
+    def register(self, handler):
+        self.handlers.append(handler)
+
+    def unregister(self, handler):
+        self.handlers.remove(handler)
+
+    def notify(self, **kwargs):
+        for handler in list(self.handlers):
+            handler(**kwargs)
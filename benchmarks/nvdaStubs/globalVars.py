@@ -0,0 +1,12 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA globalVars module.
+# configPath is set by benchmarks.environment before the add-on is imported.
+import types
+
+appArgs = types.SimpleNamespace(configPath=None)
+settingsRing = None
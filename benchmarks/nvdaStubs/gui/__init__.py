@@ -0,0 +1,11 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA gui package.
+from . import guiHelper, nvdaControls, settingsDialogs
+
+def messageBox(message, caption="", style=0, parent=None):
+    return 0
@@ -0,0 +1,38 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA nvwave module.
+# Wave players don't play anything, but remember the thread that created them, so that tests can check it.
+from enum import Enum
+import threading
+
+class AudioPurpose(Enum):
+    SPEECH = "speech"
+    SOUNDS = "sounds"
+
+# Every WavePlayer created so far, along with the name of the thread that created it
+createdPlayers = []
+
+class WavePlayer:
+    def __init__(self, channels, samplesPerSec, bitsPerSample, outputDevice=None, wantDucking=True, purpose=AudioPurpose.SPEECH):
+        self.channels = channels
+        self.samplesPerSec = samplesPerSec
+        self.bitsPerSample = bitsPerSample
+        self.outputDevice = outputDevice
+        self.fedBytes = 0
+        createdPlayers.append((self, threading.current_thread().name))
+
+    def feed(self, data, size=None, onDone=None):
+        self.fedBytes += len(data) if size is None else size
+
+    def idle(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,18 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA scriptHandler module.
+
+def script(**kwargs):
+    def decorator(func):
+        return func
+    return decorator
+
+def willSayAllResume(gesture):
+    return False
+
+def getLastScriptRepeatCount():
+    return 0
@@ -0,0 +1,22 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA speech package.
+from . import commands
+from . import types
+from . import speech
+from . import sayAll
+from .speech import (
+    cancelSpeech,
+    getControlFieldSpeech,
+    getCurrentLanguage,
+    getPropertiesSpeech,
+    getTextInfoSpeech,
+    isBlank,
+    processText,
+    speak,
+    speakTextInfo,
+)
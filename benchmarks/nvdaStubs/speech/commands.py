@@ -0,0 +1,93 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA speech.commands module.
+
+class SpeechCommand:
+    pass
+
+class SynthCommand(SpeechCommand):
+    pass
+
+class IndexCommand(SynthCommand):
+    def __init__(self, index):
+        self.index = index
+
+    def __repr__(self):
+        return "IndexCommand(%r)" % self.index
+
+class CharacterModeCommand(SynthCommand):
+    def __init__(self, state):
+        self.state = state
+
+    def __repr__(self):
+        return "CharacterModeCommand(%r)" % self.state
+
+class LangChangeCommand(SynthCommand):
+    def __init__(self, lang):
+        self.lang = lang
+
+    def __repr__(self):
+        return "LangChangeCommand (%r)" % self.lang
+
+class BreakCommand(SynthCommand):
+    def __init__(self, time=0):
+        self.time = time
+
+    def __repr__(self):
+        return "BreakCommand(time=%d)" % self.time
+
+class EndUtteranceCommand(SpeechCommand):
+    def __repr__(self):
+        return "EndUtteranceCommand()"
+
+class BaseProsodyCommand(SynthCommand):
+    settingName = None
+
+    def __init__(self, offset=0, multiplier=1):
+        if offset != 0 and multiplier != 1:
+            raise ValueError("You can specify either a multiplier or an offset, but not both")
+        self._offset = offset
+        self._multiplier = multiplier
+
+    @property
+    def offset(self):
+        return self._offset
+
+    @property
+    def multiplier(self):
+        return self._multiplier
+
+    def __repr__(self):
+        if self._multiplier != 1:
+            return "{type}(multiplier={mult})".format(type=type(self).__name__, mult=self._multiplier)
+        elif self._offset != 0:
+            return "{type}(offset={offset})".format(type=type(self).__name__, offset=self._offset)
+        return "{type}()".format(type=type(self).__name__)
+
+class PitchCommand(BaseProsodyCommand):
+    settingName = "pitch"
+
+class VolumeCommand(BaseProsodyCommand):
+    settingName = "volume"
+
+class RateCommand(BaseProsodyCommand):
+    settingName = "rate"
+
+class BaseCallbackCommand(SpeechCommand):
+    def run(self):
+        raise NotImplementedError
+
+class BeepCommand(SpeechCommand):
+    def __init__(self, hz, length, left=50, right=50):
+        self.hz = hz
+        self.length = length
+        self.left = left
+        self.right = right
+
+    def __repr__(self):
+        return "BeepCommand({hz}, {length}, left={left}, right={right})".format(
+            hz=self.hz, length=self.length, left=self.left, right=self.right)
@@ -0,0 +1,19 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA speech.sayAll module.
+from . import speech
+
+class SpeechWithoutPauses:
+    def __init__(self, speakFunc):
+        self.speak = speakFunc
+
+class _SayAllHandler:
+    def __init__(self):
+        self.speechWithoutPausesInstance = SpeechWithoutPauses(speech.speak)
+        self._getTextInfoSpeech = speech.getTextInfoSpeech
+
+SayAllHandler = _SayAllHandler()
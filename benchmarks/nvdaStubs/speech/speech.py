@@ -0,0 +1,296 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA speech.speech module.
+# getTextInfoSpeech follows the structure of NVDA implementation closely enough for the add-on:
+# it walks fields of TextInfo, asks TextInfo for control and format field speech,
+# tracks control field stack in SpeakTextInfoState when useCache is set and speaks blank when there is no text.
+# Functions are looked up through module globals, so that they pick up monkey patches, as they do in NVDA.
+# Sequences passed to speak() are appended to spokenSequences instead of being sent to a synthesizer.
+import characterProcessing
+import config
+from config.configFlags import ReportLineIndentation
+import controlTypes
+from controlTypes import OutputReason
+from enum import IntEnum
+import re
+import textInfos
+import weakref
+from . import types
+
+spokenSequences = []
+cancelCount = 0
+
+BLANK_CHUNK_CHARS = frozenset((" ", "\n", "\r", "\0", "\xa0"))
+RE_INDENTATION_CONVERT = re.compile(r"(?P<char>\s)(?P=char)*", re.UNICODE)
+IDT_BASE_FREQUENCY = 220
+IDT_TONE_DURATION = 80
+IDT_MAX_SPACES = 72
+# "Out of" is only announced when exiting these roles
+CONTAINER_ROLES = frozenset([
+    controlTypes.Role.LIST,
+    controlTypes.Role.TABLE,
+    controlTypes.Role.FRAME,
+    controlTypes.Role.DOCUMENT,
+])
+
+class SpeechMode(IntEnum):
+    off = 0
+    beeps = 1
+    talk = 2
+    onDemand = 3
+
+class SpeechState:
+    def __init__(self):
+        self.speechMode = SpeechMode.talk
+
+_speechState = SpeechState()
+
+def isBlank(text):
+    return not text or set(text) <= BLANK_CHUNK_CHARS
+
+def getCurrentLanguage():
+    return "en"
+
+def processText(locale, text, symbolLevel, normalize=False):
+    return characterProcessing.processSpeechSymbols(locale, text, symbolLevel)
+
+def getIndentToneDuration():
+    return IDT_TONE_DURATION
+
+def speak(speechSequence, symbolLevel=None, priority=None):
+    spokenSequences.append(list(speechSequence))
+
+def cancelSpeech():
+    global cancelCount
+    cancelCount += 1
+
+def getSpellingSpeech(text, locale=None, useCharacterDescriptions=False):
+    for char in text:
+        yield characterProcessing.processSpeechSymbol(locale, char)
+
+def getSingleCharDescription(text, locale=None):
+    return []
+
+def _getSelectionMessageSpeech(message, text):
+    return [message % text]
+
+def getIndentationSpeech(indentation, formatConfig):
+    if formatConfig["reportLineIndentation"] not in (ReportLineIndentation.SPEECH, ReportLineIndentation.SPEECH_AND_TONES):
+        return []
+    if not indentation:
+        return ["no indent"]
+    return [f"{len(indentation)} space"]
+
+def getPropertiesSpeech(reason=OutputReason.QUERY, **propertyValues):
+    textList = []
+    role = propertyValues.get("role", None)
+    if role is not None:
+        textList.append(role.displayString)
+    states = propertyValues.get("states", None)
+    if states is not None:
+        textList.extend(controlTypes.processAndLabelStates(role, states, reason, states, propertyValues.get("negativeStates", None)))
+    level = propertyValues.get("level", None)
+    if level is not None:
+        textList.append(f"level {level}")
+    return textList
+
+def getObjectPropertiesSpeech(obj, reason=OutputReason.QUERY, _prefixSpeechCommand=None, **allowedProperties):
+    values = {
+        name: getattr(obj, name)
+        for name, allowed in allowedProperties.items()
+        if allowed and hasattr(obj, name)
+    }
+    sequence = getPropertiesSpeech(reason, **values)
+    if _prefixSpeechCommand is not None:
+        sequence.insert(0, _prefixSpeechCommand)
+    return sequence
+
+def getControlFieldSpeech(attrs, ancestorAttrs, fieldType, formatConfig=None, extraDetail=False, reason=None):
+    role = attrs.get("role", controlTypes.Role.UNKNOWN)
+    if role == controlTypes.Role.UNKNOWN:
+        return []
+    if fieldType.startswith("end_"):
+        if role not in CONTAINER_ROLES:
+            return []
+        roleText = getPropertiesSpeech(reason, role=role)
+        return ["out of %s" % roleText[0]] if len(roleText) > 0 else []
+    sequence = getPropertiesSpeech(reason, role=role)
+    if len(attrs.get("states", ())) > 0:
+        sequence.extend(getPropertiesSpeech(reason, states=attrs["states"]))
+    if attrs.get("level", None) is not None:
+        sequence.extend(getPropertiesSpeech(reason, level=attrs["level"]))
+    return sequence
+
+FONT_ATTRIBUTES = ["bold", "italic", "underline", "strikethrough"]
+def getFormatFieldSpeech(attrs, attrsCache=None, formatConfig=None, reason=None, unit=None, extraDetail=False, initialFormat=False):
+    if not formatConfig:
+        formatConfig = config.conf["documentFormatting"]
+    textList = []
+    if formatConfig["reportFontAttributes"]:
+        for name in FONT_ATTRIBUTES:
+            value = attrs.get(name, None)
+            oldValue = attrsCache.get(name, None) if attrsCache is not None else None
+            if (value or oldValue is not None) and value != oldValue:
+                textList.append(name if value else f"no {name}")
+    if formatConfig["reportFontSize"]:
+        fontSize = attrs.get("font-size", None)
+        oldFontSize = attrsCache.get("font-size", None) if attrsCache is not None else None
+        if fontSize and fontSize != oldFontSize:
+            textList.append(fontSize)
+    if attrsCache is not None:
+        attrsCache.clear()
+        attrsCache.update(attrs)
+    return textList
+
+class SpeakTextInfoState:
+    """Caches the state of previous getTextInfoSpeech calls on NVDAObject, as NVDA does."""
+    __slots__ = ["objRef", "controlFieldStackCache", "formatFieldAttributesCache", "indentationCache"]
+
+    def __init__(self, obj):
+        if isinstance(obj, SpeakTextInfoState):
+            oldState = obj
+            self.objRef = oldState.objRef
+        else:
+            self.objRef = weakref.ref(obj)
+            oldState = getattr(obj, "_speakTextInfoState", None)
+        self.controlFieldStackCache = list(oldState.controlFieldStackCache) if oldState else []
+        self.formatFieldAttributesCache = dict(oldState.formatFieldAttributesCache) if oldState else {}
+        self.indentationCache = oldState.indentationCache if oldState else ""
+
+    def updateObj(self):
+        obj = self.objRef()
+        if obj:
+            obj._speakTextInfoState = self.copy()
+
+    def copy(self):
+        return self.__class__(self)
+
+def getTextInfoSpeech(
+    info,
+    useCache=True,
+    formatConfig=None,
+    unit=None,
+    reason=OutputReason.QUERY,
+    _prefixSpeechCommand=None,
+    onlyInitialFields=False,
+    suppressBlanks=False,
+):
+    if isinstance(useCache, SpeakTextInfoState):
+        speakTextInfoState = useCache
+    elif useCache:
+        speakTextInfoState = SpeakTextInfoState(info.obj)
+    else:
+        speakTextInfoState = None
+    extraDetail = unit in (textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD)
+    if not formatConfig:
+        formatConfig = config.conf["documentFormatting"]
+    formatConfig = formatConfig.copy()
+    if extraDetail:
+        formatConfig["extraDetail"] = True
+    language = getCurrentLanguage()
+    textWithFields = info.getTextWithFields(formatConfig)
+    # Fields at the start of the range are the controls that the range is in
+    newControlFieldStack = []
+    for field in textWithFields:
+        if not isinstance(field, textInfos.FieldCommand) or field.command != "controlStart":
+            break
+        newControlFieldStack.append(field.field)
+    initialFieldCount = len(newControlFieldStack)
+    oldControlFieldStack = speakTextInfoState.controlFieldStackCache if speakTextInfoState is not None else []
+    commonFieldCount = 0
+    for oldField, newField in zip(oldControlFieldStack, newControlFieldStack):
+        if oldField != newField:
+            break
+        commonFieldCount += 1
+    speechSequence = []
+    if _prefixSpeechCommand is not None:
+        speechSequence.append(_prefixSpeechCommand)
+    for index in range(len(oldControlFieldStack) - 1, commonFieldCount - 1, -1):
+        speechSequence.extend(info.getControlFieldSpeech(
+            oldControlFieldStack[index],
+            oldControlFieldStack[:index],
+            "end_removedFromControlFieldStack",
+            formatConfig,
+            extraDetail,
+            reason=reason,
+        ))
+    for index in range(commonFieldCount, len(newControlFieldStack)):
+        speechSequence.extend(info.getControlFieldSpeech(
+            newControlFieldStack[index],
+            newControlFieldStack[:index],
+            "start_addedToControlFieldStack",
+            formatConfig,
+            extraDetail,
+            reason=reason,
+        ))
+    formatFieldAttributesCache = speakTextInfoState.formatFieldAttributesCache if speakTextInfoState is not None else {}
+    texts = [field for field in textWithFields[initialFieldCount:] if isinstance(field, str) and len(field) > 0]
+    isSpelling = extraDetail and len(texts) == 1 and len(texts[0]) == 1
+    hasText = False
+    controlStack = list(newControlFieldStack)
+    if not onlyInitialFields:
+        for field in textWithFields[initialFieldCount:]:
+            if isinstance(field, str):
+                if len(field) > 0 and not isSpelling:
+                    speechSequence.append(field)
+                    hasText = hasText or not isBlank(field)
+            elif field.command == "controlStart":
+                speechSequence.extend(info.getControlFieldSpeech(
+                    field.field,
+                    controlStack,
+                    "start_relative",
+                    formatConfig,
+                    extraDetail,
+                    reason=reason,
+                ))
+                controlStack.append(field.field)
+            elif field.command == "controlEnd":
+                # Controls that range started in are only exited by the next call
+                if len(controlStack) > len(newControlFieldStack):
+                    attrs = controlStack.pop()
+                    speechSequence.extend(info.getControlFieldSpeech(
+                        attrs,
+                        controlStack,
+                        "end_relative",
+                        formatConfig,
+                        extraDetail,
+                        reason=reason,
+                    ))
+            elif field.command == "formatChange":
+                speechSequence.extend(info.getFormatFieldSpeech(
+                    field.field,
+                    formatFieldAttributesCache,
+                    formatConfig,
+                    reason,
+                    unit,
+                    extraDetail,
+                ))
+    if speakTextInfoState is not None:
+        speakTextInfoState.controlFieldStackCache = newControlFieldStack
+        speakTextInfoState.formatFieldAttributesCache = formatFieldAttributesCache
+        if not isinstance(useCache, SpeakTextInfoState):
+            speakTextInfoState.updateObj()
+    if isSpelling and not onlyInitialFields:
+        yield from _getTextInfoSpeech_considerSpelling(unit, onlyInitialFields, texts, reason, speechSequence, language)
+        return True
+    if not hasText and not suppressBlanks and not onlyInitialFields:
+        speechSequence.append("blank")
+    if len(speechSequence) > 0:
+        yield speechSequence
+    return True
+
+def _getTextInfoSpeech_considerSpelling(unit, onlyInitialFields, textWithFields, reason, speechSequence, language):
+    if onlyInitialFields or any(isinstance(x, str) for x in speechSequence):
+        yield speechSequence
+    if not onlyInitialFields:
+        spellingSequence = list(getSpellingSpeech(textWithFields[0], locale=language))
+        types.logBadSequenceTypes(spellingSequence)
+        yield spellingSequence
+
+def speakTextInfo(info, useCache=True, formatConfig=None, unit=None, reason=OutputReason.QUERY, _prefixSpeechCommand=None, onlyInitialFields=False, suppressBlanks=False):
+    for sequence in getTextInfoSpeech(info, useCache, formatConfig, unit, reason, _prefixSpeechCommand, onlyInitialFields, suppressBlanks):
+        speak(sequence)
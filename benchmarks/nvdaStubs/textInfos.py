@@ -0,0 +1,51 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA textInfos module.
+
+UNIT_CHARACTER = "character"
+UNIT_WORD = "word"
+UNIT_LINE = "line"
+UNIT_SENTENCE = "sentence"
+UNIT_PARAGRAPH = "paragraph"
+UNIT_CELL = "cell"
+POSITION_CARET = "caret"
+
+class ControlField(dict):
+    pass
+
+class FormatField(dict):
+    pass
+
+class FieldCommand:
+    def __init__(self, command, field):
+        if command not in ("controlStart", "controlEnd", "formatChange"):
+            raise ValueError("Unknown command: %s" % command)
+        elif command == "controlStart" and not isinstance(field, ControlField):
+            raise ValueError("command: %s needs a controlField" % command)
+        elif command == "formatChange" and not isinstance(field, FormatField):
+            raise ValueError("command: %s needs a formatField" % command)
+        self.command = command
+        self.field = field
+
+    def __repr__(self):
+        return "FieldCommand %s with %s" % (self.command, self.field)
+
+class TextInfo:
+    """
+    Base class of TextInfos, only providing speech of fields.
+    Subclasses implement getTextWithFields(), text and obj.
+    """
+    def getControlFieldSpeech(self, attrs, ancestorAttrs, fieldType, formatConfig=None, extraDetail=False, reason=None):
+        import speech
+        return speech.speech.getControlFieldSpeech(attrs, ancestorAttrs, fieldType, formatConfig, extraDetail, reason)
+
+    def getFormatFieldSpeech(self, attrs, attrsCache=None, formatConfig=None, reason=None, unit=None, extraDetail=False, initialFormat=False):
+        import speech
+        return speech.speech.getFormatFieldSpeech(attrs, attrsCache, formatConfig, reason, unit, extraDetail, initialFormat)
+
+    def getMathMl(self, field):
+        raise LookupError
@@ -0,0 +1,15 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of NVDA tones module.
+
+SAMPLE_RATE = 44100
+
+def initialize():
+    pass
+
+def beep(hz, length, left=50, right=50):
+    pass
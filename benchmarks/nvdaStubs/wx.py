@@ -0,0 +1,27 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Stub of wxPython.
+# CallAfter queues calls until processPendingCalls() is called, which stands in for the main loop.
+import collections
+
+OK = 0x4
+ICON_ERROR = 0x200
+ICON_WARNING = 0x100
+ICON_INFORMATION = 0x800
+
+pendingCalls = collections.deque()
+
+def CallAfter(func, *args, **kwargs):
+    pendingCalls.append((func, args, kwargs))
+
+def processPendingCalls():
+    while len(pendingCalls) > 0:
+        func, args, kwargs = pendingCalls.popleft()
+        func(*args, **kwargs)
+
+class TextCtrl:
+    pass
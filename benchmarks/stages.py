@@ -0,0 +1,103 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+# Benchmark stages that only make sense outside of NVDA,
+# since they block the main thread or change state of the running add-on.
+# They are reported together with the add-on benchmark by python -m benchmarks.
+
+import itertools
+import time
+
+# Time NVDA spends fetching next say all chunk from the application, e.g. through COM, when Python code doesn't run
+SAY_ALL_FETCH_SECONDS = 0.001
+
+def runSayAllStages(addon, iterations):
+    # Say all chunks with and without blank rule: blank detection needs an extra pass through NVDA speech code per chunk.
+    from controlTypes import OutputReason
+    import textInfos
+    benchmark, frenzy, pp = addon.benchmark, addon.frenzy, addon.pp
+    lines = list(itertools.chain.from_iterable(itertools.repeat(benchmark.PROSE + benchmark.LOGS, iterations)))
+    fieldLists = [benchmark.makeParagraphFields(line) for line in lines]
+    totalChars = sum(len(line) for line in lines)
+    report = []
+    with pp.reloadLock:
+        ruleset = pp.ruleset
+        frenzyRules = ruleset.frenzy
+        otherRulesWithoutBlank = {key: rule for key, rule in frenzyRules.otherRules.items() if key != pp.OtherRule.BLANK}
+        stages = [
+            ("say all blank rule", frenzyRules.formatPlan),
+            ("say all no blank rule", frenzy.FormatPlan.compile(frenzyRules.formatRules, frenzyRules.numericFormatRules, otherRulesWithoutBlank)),
+        ]
+        try:
+            for stageName, plan in stages:
+                pp.ruleset = ruleset._replace(frenzy=frenzyRules._replace(formatPlan=plan))
+                inputs = benchmark.makeTextInfos(fieldLists)
+                timings = benchmark.timeStage(lambda info: list(frenzy.new_getTextInfoSpeech(info, unit=textInfos.UNIT_LINE, reason=OutputReason.SAYALL)), inputs)
+                report.append(benchmark.formatStageReport("lines", stageName, timings, totalChars))
+        finally:
+            pp.ruleset = ruleset
+            addon.lookAhead.discard()
+    return report
+
+def runSayAllLookAheadStages(addon, iterations):
+    """
+    Say all over plain lines, measuring how long preSpeak takes for every chunk, with and without look-ahead.
+    Chunk fetch is simulated with sleep, during which look-ahead worker can apply text rules to the previous chunk.
+    """
+    from controlTypes import OutputReason
+    import speech
+    import textInfos
+    benchmark, frenzy, lookAhead, pp, utils = addon.benchmark, addon.frenzy, addon.lookAhead, addon.pp, addon.utils
+    lines = list(itertools.chain.from_iterable(itertools.repeat(benchmark.PROSE, max(1, iterations // 4))))
+    fieldLists = [benchmark.makeParagraphFields(line) for line in lines]
+    totalChars = sum(len(line) for line in lines)
+    enabled = utils.getConfig("sayAllLookAhead")
+    report = []
+    try:
+        for stageName, lookAheadEnabled in [("say all no look-ahead", False), ("say all look-ahead", True)]:
+            utils.setConfig("sayAllLookAhead", lookAheadEnabled)
+            lookAhead.discard()
+            timings = []
+            for info in benchmark.makeTextInfos(fieldLists):
+                sequences = list(frenzy.new_getTextInfoSpeech(info, unit=textInfos.UNIT_LINE, reason=OutputReason.SAYALL))
+                time.sleep(SAY_ALL_FETCH_SECONDS)
+                t0 = time.perf_counter()
+                for sequence in sequences:
+                    pp.preSpeak(sequence)
+                timings.append(time.perf_counter() - t0)
+            del speech.speech.spokenSequences[:]
+            report.append(benchmark.formatStageReport("lines", stageName, timings, totalChars))
+    finally:
+        utils.setConfig("sayAllLookAhead", enabled)
+        lookAhead.discard()
+    return report
+
+def runColdStartStages(addon, iterations):
+    # Startup loads rules with empty decoding cache: either every wave file is decoded, or decoded audio is loaded from snapshot.
+    benchmark, commands, pp = addon.benchmark, addon.commands, addon.pp
+    runs = max(1, iterations // 10)
+    ruleCount = len(pp.compiledRules)
+    def coldStart(snapshotKeys):
+        commands.decodedWaveFiles.clear()
+        pp.snapshotKeys = snapshotKeys
+        pp.reloadRules(force=True)
+    stages = [
+        # Empty set of snapshot keys means that snapshot is not loaded and is saved again after decoding
+        ("cold start no snapshot", lambda: coldStart(set())),
+        ("cold start with snapshot", lambda: coldStart(None)),
+    ]
+    report = []
+    for stageName, func in stages:
+        timings = benchmark.timeStage(lambda _: func(), range(runs))
+        report.append(benchmark.formatStageReport("rules", stageName, timings, ruleCount * runs, unit="rules"))
+    return report
+
+def runHeadlessStages(addon, iterations):
+    return (
+        runSayAllStages(addon, iterations)
+        + runSayAllLookAheadStages(addon, iterations)
+        + runColdStartStages(addon, iterations)
+    )
@@ -0,0 +1,57 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import unittest
+from benchmarks import environment
+from benchmarks import stages
+
+addon = environment.loadAddon()
+import speech
+pp = addon.pp
+profiling = addon.profiling
+
+class BenchmarkTest(unittest.TestCase):
+    def testPreSpeakReplacesPunctuationWithEarcons(self):
+        speech.speech.spokenSequences.clear()
+        speech.speak(["Hello, world"])
+        sequence = speech.speech.spokenSequences[-1]
+        self.assertIsInstance(sequence[1], addon.commands.PpChainCommand)
+        self.assertEqual(sequence[0], "Hello")
+
+    def testRunBenchmark(self):
+        report = addon.benchmark.runBenchmark(iterations=1)
+        self.assertGreater(len(report), 0)
+        for line in report:
+            self.assertIn("/s, ", line)
+            self.assertIn("p99=", line)
+
+    def testRunBenchmarkLeavesStateAsItWas(self):
+        pp.resetProsodies([])
+        pp.fixProsodyCommands([speech.commands.PitchCommand(offset=10)])
+        rule = next(iter(pp.compiledRules.values()))
+        pp.quarantinedRules[rule] = "slow"
+        profiling.resetCounters()
+        profiling.addStageTime("preSpeak", 0.001)
+        counters = (profiling.ruleCounters, profiling.stageCounters, profiling.blanknessCounters, profiling.lookAheadCounters)
+        try:
+            addon.benchmark.runBenchmark(iterations=1)
+            self.assertEqual(pp.quarantinedRules, {rule: "slow"})
+            self.assertEqual(dict(pp.prosodyOffsets), {speech.commands.PitchCommand: 10})
+            self.assertEqual(dict(pp.prosodyStacks), {speech.commands.PitchCommand: [0]})
+            self.assertEqual(pp.displacedProsodies, {speech.commands.PitchCommand})
+            self.assertEqual((profiling.ruleCounters, profiling.stageCounters, profiling.blanknessCounters, profiling.lookAheadCounters), counters)
+            self.assertEqual(list(profiling.stageCounters.keys()), ["preSpeak"])
+        finally:
+            pp.quarantinedRules.clear()
+            pp.resetProsodies([])
+
+    def testRunHeadlessStages(self):
+        report = stages.runHeadlessStages(addon, iterations=1)
+        self.assertTrue(any("cold start with snapshot" in line for line in report))
+        self.assertTrue(any("say all look-ahead" in line for line in report))
+
+if __name__ == "__main__":
+    unittest.main()
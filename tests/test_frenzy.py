@@ -0,0 +1,98 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import unittest
+from benchmarks import environment
+
+addon = environment.loadAddon()
+pp = addon.pp
+frenzy = addon.frenzy
+recording = addon.recording
+import controlTypes
+from controlTypes import OutputReason
+import textInfos
+
+def makeFields(text, heading=False, **formatting):
+    fields = [textInfos.FieldCommand("controlStart", textInfos.ControlField(role=controlTypes.Role.PARAGRAPH))]
+    if heading:
+        fields.append(textInfos.FieldCommand("controlStart", textInfos.ControlField(role=controlTypes.Role.HEADING, level="2")))
+    fields.append(textInfos.FieldCommand("formatChange", textInfos.FormatField(formatting)))
+    fields.append(text)
+    if heading:
+        fields.append(textInfos.FieldCommand("controlEnd", None))
+    fields.append(textInfos.FieldCommand("controlEnd", None))
+    return fields
+
+# Caret movements over a document with some formatting changes
+DOCUMENT = (
+    [makeFields(c) for c in "plain"]
+    + [makeFields(c, bold=True) for c in "bold"]
+    + [makeFields(c, **{"font-size": "12pt"}) for c in "sized"]
+    + [makeFields(c, **{"font-size": "12pt"}) for c in "same"]
+    + [makeFields(c, heading=True) for c in "head"]
+    + [makeFields(c) for c in "end"]
+)
+
+def speakDocument(unit):
+    obj = recording.ReplayObject()
+    result = []
+    for fields in DOCUMENT:
+        info = recording.ReplayTextInfo(fields, "".join(field for field in fields if isinstance(field, str)))
+        info.obj = obj
+        result.append([repr(sequence) for sequence in frenzy.doGetTextInfoSpeech(info, unit=unit, reason=OutputReason.CARET)])
+        result.append(dict(obj.ppCache))
+    return result
+
+class FrenzyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.originalRuleset = pp.ruleset
+
+    def tearDown(self):
+        pp.ruleset = self.originalRuleset
+
+    def publishFormatPlan(self, plan):
+        pp.ruleset = pp.ruleset._replace(frenzy=pp.ruleset.frenzy._replace(formatPlan=plan))
+
+class CharacterOrWordFastPathTest(FrenzyTestCase):
+    def testFastPathDoesNotChangeOutput(self):
+        frenzyRules = pp.ruleset.frenzy
+        # Font size is announced with text, otherwise fast path is never taken when font size changes
+        numericFormatRules = dict(frenzyRules.numericFormatRules)
+        numericFormatRules[pp.NumericTextFormat.FONT_SIZE] = pp.AudioRule(
+            comment="",
+            pattern="",
+            ruleType=pp.audioRuleTextSubstitution,
+            replacementPattern="size {}",
+            frenzyType=pp.FrenzyType.NUMERIC_FORMAT,
+            frenzyValue=pp.NumericTextFormat.FONT_SIZE,
+        )
+        otherRules = {key: rule for key, rule in frenzyRules.otherRules.items() if key != pp.OtherRule.BLANK}
+        self.publishFormatPlan(frenzy.FormatPlan.compile(frenzyRules.formatRules, numericFormatRules, otherRules))
+        computeCharacterOrWordCache = frenzy.computeCharacterOrWordCache
+        for unit in [textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD]:
+            fastPathOutput = speakDocument(unit)
+            frenzy.computeCharacterOrWordCache = lambda fields, newCache, plan: None
+            try:
+                fullPathOutput = speakDocument(unit)
+            finally:
+                frenzy.computeCharacterOrWordCache = computeCharacterOrWordCache
+            self.assertEqual(fastPathOutput, fullPathOutput)
+
+class InjectsNothingTest(FrenzyTestCase):
+    def testNoRulesDelegatesToNvda(self):
+        plan = frenzy.FormatPlan.compile({}, {}, {})
+        self.assertTrue(plan.injectsNothing)
+        self.publishFormatPlan(plan)
+        for fields in DOCUMENT:
+            text = "".join(field for field in fields if isinstance(field, str))
+            sequences = [
+                list(func(recording.ReplayTextInfo(fields, text), unit=textInfos.UNIT_LINE, reason=OutputReason.CARET))
+                for func in [frenzy.new_getTextInfoSpeech, frenzy.original_getTextInfoSpeech]
+            ]
+            self.assertEqual(sequences[0], sequences[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import unittest
+from benchmarks import environment
+
+addon = environment.loadAddon()
+pp = addon.pp
+frenzy = addon.frenzy
+lookAhead = addon.lookAhead
+profiling = addon.profiling
+recording = addon.recording
+import config
+import controlTypes
+from controlTypes import OutputReason
+import speech
+import textInfos
+
+LINES = [
+    "Hello, world!",
+    "Is this a question? Yes, it is.",
+    "Wait... what, again?",
+    "No punctuation here",
+]
+
+def makeTextInfo(text):
+    fields = [
+        textInfos.FieldCommand("controlStart", textInfos.ControlField(role=controlTypes.Role.PARAGRAPH)),
+        text,
+        textInfos.FieldCommand("controlEnd", None),
+    ]
+    return recording.ReplayTextInfo(fields, text)
+
+def readLines(reason):
+    return [
+        sequence
+        for line in LINES
+        for sequence in frenzy.new_getTextInfoSpeech(makeTextInfo(line), unit=textInfos.UNIT_LINE, reason=reason)
+    ]
+
+def describe(sequence):
+    return [repr(command) if not isinstance(command, pp.MaskedString) else ("masked", command.s) for command in sequence]
+
+class LookAheadTest(unittest.TestCase):
+    def setUp(self):
+        lookAhead.discard()
+        profiling.resetCounters()
+        self.symbolLevel = config.conf["speech"]["symbolLevel"]
+
+    def tearDown(self):
+        lookAhead.discard()
+
+    def testPreparedStringsMatchTextRules(self):
+        sequences = readLines(OutputReason.SAYALL)
+        lookAhead.waitForWorker()
+        self.assertTrue(lookAhead.hasPreparedStrings())
+        for sequence in sequences:
+            expected = pp.applyTextRulesInContext(sequence, self.symbolLevel, pp.ruleset, addon.utils.getCurrentContextValue, speech.getCurrentLanguage())
+            self.assertEqual(describe(pp.applyTextRules(sequence, self.symbolLevel)), describe(expected))
+        counters = profiling.lookAheadCounters
+        # Every string of say all speech has been prepared
+        self.assertGreaterEqual(counters.hits, len(LINES))
+        self.assertEqual(counters.misses, 0)
+        self.assertGreater(counters.seconds, 0)
+
+    def testRegroupedStringsAreProcessedInline(self):
+        readLines(OutputReason.SAYALL)
+        lookAhead.waitForWorker()
+        # speakWithoutPauses splits strings at sentence boundaries
+        sequence = ["Is this a question?", " Yes, it is."]
+        expected = pp.applyTextRulesInContext(sequence, self.symbolLevel, pp.ruleset, addon.utils.getCurrentContextValue, speech.getCurrentLanguage())
+        self.assertEqual(describe(pp.applyTextRules(sequence, self.symbolLevel)), describe(expected))
+        self.assertEqual(profiling.lookAheadCounters.hits, 0)
+
+    def testCancelDiscardsPreparedStrings(self):
+        readLines(OutputReason.SAYALL)
+        lookAhead.waitForWorker()
+        speech.speech.cancelSpeech()
+        self.assertFalse(lookAhead.hasPreparedStrings())
+        self.assertGreater(profiling.lookAheadCounters.discarded, 0)
+
+    def testCaretMovementDiscardsPreparedStrings(self):
+        readLines(OutputReason.SAYALL)
+        lookAhead.waitForWorker()
+        list(frenzy.new_getTextInfoSpeech(makeTextInfo("Moved"), unit=textInfos.UNIT_LINE, reason=OutputReason.CARET))
+        self.assertFalse(lookAhead.hasPreparedStrings())
+
+    def testReloadedRulesAreNotTaken(self):
+        readLines(OutputReason.SAYALL)
+        lookAhead.waitForWorker()
+        originalRuleset = pp.ruleset
+        pp.ruleset = originalRuleset._replace()
+        try:
+            pp.applyTextRules([LINES[0]], self.symbolLevel)
+        finally:
+            pp.ruleset = originalRuleset
+        self.assertEqual(profiling.lookAheadCounters.hits, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,415 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from benchmarks import environment
+
+addon = environment.loadAddon()
+pp = addon.pp
+import characterProcessing
+import controlTypes
+from config.configFlags import ReportLineIndentation
+import globalVars
+import nvwave
+import speech
+import wx
+
+def makeWaveRule(pattern, frenzyType, frenzyValue=""):
+    return pp.AudioRule(
+        comment="",
+        pattern=pattern,
+        ruleType=pp.audioRuleBuiltInWave,
+        builtInWavFile=os.path.join("punctuation", "Backslash.wav"),
+        frenzyType=frenzyType,
+        frenzyValue=frenzyValue,
+    )
+
+class RulesetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.originalRuleset = pp.ruleset
+
+    def tearDown(self):
+        pp.ruleset = self.originalRuleset
+
+class PrecompiledCommandsTest(RulesetTestCase):
+    def testProcessSpeechSymbolReusesCompiledCommand(self):
+        rule = makeWaveRule("$", pp.FrenzyType.CHARACTER)
+        pp.ruleset = pp.ruleset._replace(characterRules={"$": rule})
+        playerCount = len(nvwave.createdPlayers)
+        for i in range(10):
+            self.assertIs(characterProcessing.processSpeechSymbol("en", "$"), rule.speechCommand)
+        self.assertEqual(len(nvwave.createdPlayers), playerCount)
+
+    def testNoIndentReusesCompiledCommand(self):
+        rule = makeWaveRule("", pp.FrenzyType.OTHER_RULE, pp.OtherRule.NO_INDENT)
+        frenzyRules = pp.ruleset.frenzy
+        pp.ruleset = pp.ruleset._replace(frenzy=frenzyRules._replace(otherRules={pp.OtherRule.NO_INDENT: rule}))
+        formatConfig = {"reportLineIndentation": ReportLineIndentation.SPEECH}
+        playerCount = len(nvwave.createdPlayers)
+        for i in range(10):
+            self.assertEqual(speech.speech.getIndentationSpeech("", formatConfig), [rule.speechCommand])
+        self.assertEqual(len(nvwave.createdPlayers), playerCount)
+
+@unittest.skipUnless(os.path.isdir("/proc/self/fd"), "Needs /proc to count open file descriptors")
+class ReloadFileDescriptorsTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.wavFile = os.path.join(self.tempDir, "earcon.wav")
+        shutil.copy(os.path.join(addon.utils.getSoundsPath(), "punctuation", "Backslash.wav"), self.wavFile)
+        rule = pp.AudioRule(
+            comment="",
+            pattern="$",
+            ruleType=pp.audioRuleWave,
+            wavFile=self.wavFile,
+            frenzyType=pp.FrenzyType.CHARACTER,
+        )
+        environment.writeRulesFile(globalVars.appArgs.configPath, [rule.asDict()])
+
+    def tearDown(self):
+        environment.writeRulesFile(globalVars.appArgs.configPath)
+        pp.reloadRules(force=True)
+        shutil.rmtree(self.tempDir)
+
+    def countOpenFiles(self):
+        return len(os.listdir("/proc/self/fd"))
+
+    def reloadManyTimes(self, changeWavFile):
+        pp.reloadRules(force=True)
+        openFiles = self.countOpenFiles()
+        decodeKeys = set()
+        for i in range(20):
+            if changeWavFile:
+                wavFileName = "Backslash.wav" if i % 2 else "LeftParen.wav"
+                shutil.copy(os.path.join(addon.utils.getSoundsPath(), "punctuation", wavFileName), self.wavFile)
+            pp.reloadRules(force=True)
+            speechCommand = pp.ruleset.characterRules["$"].speechCommand
+            self.assertEqual(speechCommand.fileName, self.wavFile)
+            decodeKeys.add(speechCommand.decodeKey)
+        # Changed wave file is decoded again, unchanged one is taken from decoding cache
+        self.assertEqual(len(decodeKeys) > 1, changeWavFile)
+        self.assertEqual(self.countOpenFiles(), openFiles)
+
+    def testUnchangedWavFile(self):
+        self.reloadManyTimes(changeWavFile=False)
+
+    def testChangedWavFile(self):
+        self.reloadManyTimes(changeWavFile=True)
+
+class RuleCountersTest(unittest.TestCase):
+    def tearDown(self):
+        pp.reloadRules(force=True)
+
+    def testReloadDropsCountersOfReplacedRules(self):
+        for i in range(5):
+            pp.reloadRules(force=True)
+            speech.speech.speak(["Hello, world! (Is this $5?)"])
+        liveRules = set(pp.compiledRules.values())
+        self.assertGreater(len(addon.profiling.ruleCounters), 0)
+        self.assertLessEqual(set(addon.profiling.ruleCounters.keys()), liveRules)
+        report = addon.profiling.formatReport()
+        ruleLines = report[report.index("Rules:") + 1:]
+        self.assertEqual(len(ruleLines), len(addon.profiling.ruleCounters))
+
+class ReloadRulesTest(unittest.TestCase):
+    def tearDown(self):
+        environment.writeRulesFile(globalVars.appArgs.configPath)
+        pp.reloadRules(force=True)
+
+    def testWavePlayersAreCreatedOnMainThread(self):
+        playerCount = len(nvwave.createdPlayers)
+        pp.reloadRulesInBackground(force=True)
+        # Background thread posts reload to the main thread when wave files are decoded
+        deadline = time.monotonic() + 10
+        while len(wx.pendingCalls) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(nvwave.createdPlayers), playerCount)
+        wx.processPendingCalls()
+        newPlayers = nvwave.createdPlayers[playerCount:]
+        self.assertGreater(len(newPlayers), 0)
+        self.assertEqual({threadName for player, threadName in newPlayers}, {threading.main_thread().name})
+
+    def testReloadDuringSpeech(self):
+        listRule = pp.AudioRule(
+            comment="",
+            pattern="",
+            ruleType=pp.audioRuleBuiltInWave,
+            builtInWavFile=os.path.join("punctuation", "LeftBracket.wav"),
+            frenzyType=pp.FrenzyType.ROLE,
+            frenzyValue=controlTypes.Role.LIST.name,
+        )
+        outOfContainerRule = pp.AudioRule(
+            comment="",
+            pattern="",
+            ruleType=pp.audioRuleBuiltInWave,
+            builtInWavFile=os.path.join("punctuation", "RightBracket.wav"),
+            frenzyType=pp.FrenzyType.OTHER_RULE,
+            frenzyValue=pp.OtherRule.OUT_OF_CONTAINER.name,
+        )
+        # Exiting a list is either announced with out of container earcon, or spoken by NVDA when there are no rules
+        rulesFiles = [[listRule.asDict(), outOfContainerRule.asDict()], []]
+        expectedOutputs = [[repr(outOfContainerRule.speechCommand)], ["out of list"]]
+        stopped = threading.Event()
+        def reloadThreadFunc():
+            # Rules are reloaded the way the add-on does it: wave files are decoded in background, then rules are published on the main thread.
+            i = 0
+            while not stopped.is_set():
+                i += 1
+                environment.writeRulesFile(globalVars.appArgs.configPath, rulesFiles[i % 2])
+                ruleset = pp.ruleset
+                pp.reloadRulesInBackground()
+                while pp.ruleset is ruleset:
+                    time.sleep(0)
+        environment.writeRulesFile(globalVars.appArgs.configPath, rulesFiles[0])
+        pp.reloadRules()
+        playerCount = len(nvwave.createdPlayers)
+        reloadThread = threading.Thread(target=reloadThreadFunc, daemon=True)
+        switchInterval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        reloadThread.start()
+        try:
+            outputs = set()
+            for i in range(3000):
+                # Main loop runs reloads posted by background thread between utterances
+                wx.processPendingCalls()
+                ruleset = pp.ruleset
+                rulesByFrenzy = ruleset.rulesByFrenzy
+                for role, rule in ruleset.frenzy.roleRules.items():
+                    self.assertIn(rule, rulesByFrenzy[pp.FrenzyType.ROLE])
+                for otherRule, rule in ruleset.frenzy.otherRules.items():
+                    self.assertIn(rule, rulesByFrenzy[pp.FrenzyType.OTHER_RULE])
+                output = [
+                    utterance if isinstance(utterance, str) else repr(utterance)
+                    for utterance in speech.speech.getControlFieldSpeech(
+                        {"role": controlTypes.Role.LIST},
+                        [],
+                        "end_removedFromControlFieldStack",
+                    )
+                ]
+                self.assertIn(output, expectedOutputs)
+                outputs.add(tuple(output))
+        finally:
+            sys.setswitchinterval(switchInterval)
+            stopped.set()
+            while reloadThread.is_alive():
+                wx.processPendingCalls()
+                time.sleep(0)
+            reloadThread.join()
+        self.assertEqual(len(outputs), 2)
+        newPlayers = nvwave.createdPlayers[playerCount:]
+        self.assertGreater(len(newPlayers), 0)
+        self.assertEqual({threadName for player, threadName in newPlayers}, {threading.main_thread().name})
+
+class TextRulesTest(RulesetTestCase):
+    def testDisabledRulesDontLookUpContext(self):
+        rule = pp.AudioRule(
+            comment="",
+            pattern="!",
+            ruleType=pp.audioRuleBeep,
+            tone=500,
+            duration=50,
+            enabled=False,
+            urlRegex="example",
+        )
+        rulesByFrenzy = {**pp.ruleset.rulesByFrenzy, pp.FrenzyType.TEXT: (rule,)}
+        pp.ruleset = pp.ruleset._replace(rulesByFrenzy=rulesByFrenzy)
+        addon.utils.invalidateCurrentContext()
+        urlLookupCount = addon.utils.urlLookupCount
+        self.assertEqual(pp.applyTextRules(["Hello!"], 100), ["Hello!"])
+        self.assertEqual(addon.utils.urlLookupCount, urlLookupCount)
+
+class QuarantineTest(RulesetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ruleTimeBudget = addon.utils.getConfig("ruleTimeBudget")
+        addon.utils.setConfig("ruleTimeBudget", 1)
+        self.rule = pp.AudioRule(comment="", pattern="!", ruleType=pp.audioRuleBeep, tone=500, duration=50)
+        self.slow = False
+        self.sleepy = False
+        originalProcessString = self.rule.processString
+        def processString(s, symbolLevel, language):
+            if self.slow:
+                startTime = time.thread_time()
+                while time.thread_time() - startTime < 0.005:
+                    pass
+            if self.sleepy:
+                time.sleep(0.005)
+            return originalProcessString(s, symbolLevel, language)
+        self.rule.processString = processString
+        rulesByFrenzy = {**pp.ruleset.rulesByFrenzy, pp.FrenzyType.TEXT: (self.rule,)}
+        pp.ruleset = pp.ruleset._replace(rulesByFrenzy=rulesByFrenzy)
+
+    def tearDown(self):
+        addon.utils.setConfig("ruleTimeBudget", self.ruleTimeBudget)
+        pp.quarantinedRules.clear()
+        pp.ruleOverruns.clear()
+        super().tearDown()
+
+    def speak(self, times):
+        for i in range(times):
+            pp.applyTextRules(["Hello!"], 100)
+
+    def testConsecutiveOverrunsQuarantineRule(self):
+        self.slow = True
+        self.speak(pp.QUARANTINE_OVERRUNS - 1)
+        self.assertNotIn(self.rule, pp.quarantinedRules)
+        self.slow = False
+        self.speak(1)
+        self.slow = True
+        self.speak(pp.QUARANTINE_OVERRUNS - 1)
+        self.assertNotIn(self.rule, pp.quarantinedRules)
+        self.speak(1)
+        self.assertIn(self.rule, pp.quarantinedRules)
+
+    def testWaitingIsNotCounted(self):
+        self.sleepy = True
+        self.speak(pp.QUARANTINE_OVERRUNS)
+        self.assertNotIn(self.rule, pp.quarantinedRules)
+
+    def testBudgetScalesWithTextLength(self):
+        self.slow = True
+        for i in range(pp.QUARANTINE_OVERRUNS):
+            pp.applyTextRules(["Hello!" * 2000], 100)
+        self.assertNotIn(self.rule, pp.quarantinedRules)
+
+    def testReloadClearsQuarantine(self):
+        self.slow = True
+        self.speak(pp.QUARANTINE_OVERRUNS)
+        self.assertIn(self.rule, pp.quarantinedRules)
+        pp.reloadRules(force=True)
+        self.assertEqual(len(pp.quarantinedRules), 0)
+
+def referenceChainSynchronousCommands(speechSequence, language, symbolLevel):
+    # Chaining part of postProcessSynchronousCommands before it was rewritten as a single pass.
+    def isEmptyString(command):
+        return isinstance(command, str) and speech.isBlank(speech.processText(language,command,symbolLevel))
+    newSequence = []
+    excludeIndices = set()
+    for i, command in enumerate(speechSequence):
+        if i in excludeIndices:
+            continue
+        if isinstance(command, pp.PpSynchronousCommand):
+            chain = [command]
+            for j in range(i+1, len(speechSequence)):
+                cj = speechSequence[j]
+                if isinstance(cj, pp.PpSynchronousCommand):
+                    chain.append(cj)
+                    excludeIndices.add(j)
+                elif isEmptyString(cj):
+                    excludeIndices.add(j)
+                elif isinstance(cj, (speech.commands.LangChangeCommand, pp.MaskedString, speech.commands.BaseProsodyCommand)):
+                    pass
+                else:
+                    break
+            chainCommand = pp.PpChainCommand(chain)
+            duration = chainCommand.getDuration()
+            newSequence.append(chainCommand)
+            newSequence.append(speech.commands.BreakCommand(duration))
+        elif not isEmptyString(command):
+            newSequence.append(command)
+    return newSequence
+
+def describeCommand(command):
+    if isinstance(command, pp.PpChainCommand):
+        return ("chain", tuple(id(subcommand) for subcommand in command.subcommands))
+    if isinstance(command, speech.commands.BreakCommand):
+        return ("break", command.time)
+    if isinstance(command, str):
+        return command
+    return id(command)
+
+class ChainSynchronousCommandsTest(unittest.TestCase):
+    def makeCommandFactories(self):
+        earcon = makeWaveRule("", pp.FrenzyType.TEXT).speechCommand
+        return [
+            lambda: earcon,
+            lambda: pp.PpBeepCommand(500, 50),
+            lambda: "",
+            lambda: " ",
+            lambda: "Hello",
+            lambda: "!",
+            lambda: pp.MaskedString("masked"),
+            lambda: pp.MaskedString(""),
+            lambda: speech.commands.LangChangeCommand("en"),
+            lambda: speech.commands.PitchCommand(offset=10),
+            lambda: speech.commands.PitchCommand(),
+            lambda: speech.commands.BreakCommand(100),
+            lambda: speech.commands.CharacterModeCommand(True),
+            lambda: speech.commands.IndexCommand(1),
+            lambda: speech.commands.EndUtteranceCommand(),
+        ]
+
+    def testMatchesReferenceOnRandomSequences(self):
+        factories = self.makeCommandFactories()
+        rng = random.Random(46)
+        for i in range(2000):
+            # Punctuation is blank at lower symbol levels
+            symbolLevel = rng.choice([characterProcessing.SymbolLevel_NONE, characterProcessing.SymbolLevel_ALL])
+            sequence = [rng.choice(factories)() for j in range(rng.randint(0, 12))]
+            expected = referenceChainSynchronousCommands(sequence, "en", symbolLevel)
+            actual = pp.chainSynchronousCommands(sequence, "en", symbolLevel)
+            self.assertEqual([describeCommand(c) for c in actual], [describeCommand(c) for c in expected], sequence)
+
+class ProsodyTest(unittest.TestCase):
+    def setUp(self):
+        pp.resetProsodies([])
+        pp.speechCancelledFlag = False
+
+    def testCancelResetsOnlyDisplacedProsodies(self):
+        PitchCommand, RateCommand = speech.commands.PitchCommand, speech.commands.RateCommand
+        # Utterance is cancelled while nested prosodies are still in effect
+        sequence = pp.fixProsodyCommands([
+            PitchCommand(offset=10),
+            "outer",
+            RateCommand(offset=5),
+            PitchCommand(offset=5),
+            "inner",
+        ])
+        self.assertEqual([repr(command) for command in sequence if not isinstance(command, str)], [
+            "PitchCommand(offset=10)",
+            "RateCommand(offset=5)",
+            "PitchCommand(offset=15)",
+        ])
+        self.assertEqual(pp.displacedProsodies, {PitchCommand, RateCommand})
+        speech.cancelSpeech()
+        speech.speech.spokenSequences.clear()
+        speech.speak(["Hello"])
+        speech.speak(["world"])
+        first, second = speech.speech.spokenSequences
+        resetCommands = [command for command in first if isinstance(command, speech.commands.BaseProsodyCommand)]
+        self.assertEqual({type(command) for command in resetCommands}, {PitchCommand, RateCommand})
+        self.assertEqual(len(resetCommands), 2)
+        self.assertTrue(all(command.offset == 0 for command in resetCommands))
+        self.assertFalse(any(isinstance(command, speech.commands.BaseProsodyCommand) for command in second))
+        self.assertTrue(all(len(stack) == 0 for stack in pp.prosodyStacks.values()))
+        self.assertTrue(all(offset == 0 for offset in pp.prosodyOffsets.values()))
+        self.assertEqual(len(pp.displacedProsodies), 0)
+
+    def testBalancedProsodiesAreNotDisplaced(self):
+        PitchCommand, RateCommand = speech.commands.PitchCommand, speech.commands.RateCommand
+        pp.fixProsodyCommands([
+            PitchCommand(offset=10),
+            RateCommand(offset=5),
+            "text",
+            RateCommand(),
+        ])
+        self.assertEqual(pp.displacedProsodies, {PitchCommand})
+        pp.fixProsodyCommands([
+            PitchCommand(offset=-5),
+            "text",
+            PitchCommand(),
+            PitchCommand(),
+        ])
+        self.assertEqual(len(pp.displacedProsodies), 0)
+
+if __name__ == "__main__":
+    unittest.main()
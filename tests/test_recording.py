@@ -0,0 +1,119 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import gzip
+import json
+import os
+import unittest
+from benchmarks import environment
+
+addon = environment.loadAddon()
+pp = addon.pp
+frenzy = addon.frenzy
+recording = addon.recording
+import controlTypes
+from controlTypes import OutputReason
+import speech
+import textInfos
+
+def makeFields(text, inList=False, **formatting):
+    fields = []
+    if inList:
+        fields.append(textInfos.FieldCommand("controlStart", textInfos.ControlField(role=controlTypes.Role.LIST)))
+    fields.append(textInfos.FieldCommand("controlStart", textInfos.ControlField(role=controlTypes.Role.PARAGRAPH)))
+    fields.append(textInfos.FieldCommand("formatChange", textInfos.FormatField(formatting)))
+    fields.append(text)
+    fields.append(textInfos.FieldCommand("controlEnd", None))
+    if inList:
+        fields.append(textInfos.FieldCommand("controlEnd", None))
+    return fields
+
+# Line by line movement, where what is spoken depends on the previous line:
+# entering and exiting the list, and font size and bold changes
+LINES = [
+    makeFields("Title", bold=True, **{"font-size": "16pt"}),
+    makeFields("First item", inList=True, **{"font-size": "12pt"}),
+    makeFields("Second item", inList=True, **{"font-size": "12pt"}),
+    makeFields("After list", bold=True, **{"font-size": "12pt"}),
+    makeFields("Last line", **{"font-size": "12pt"}),
+]
+
+class RecordingTest(unittest.TestCase):
+    def tearDown(self):
+        if recording.enabled:
+            recording.stopRecording()
+        if recording.recordingFileName is not None and os.path.exists(recording.recordingFileName):
+            os.remove(recording.recordingFileName)
+
+    def speakLines(self, useCache):
+        obj = recording.ReplayObject()
+        for fields in LINES:
+            info = recording.ReplayTextInfo(fields, "".join(field for field in fields if isinstance(field, str)))
+            info.obj = obj
+            list(frenzy.new_getTextInfoSpeech(info, useCache=useCache(obj), unit=textInfos.UNIT_LINE, reason=OutputReason.CARET))
+
+    def testReplayRestoresCaches(self):
+        recording.startRecording()
+        state = None
+        def getState(obj):
+            nonlocal state
+            if state is None:
+                state = speech.speech.SpeakTextInfoState(obj)
+            return state
+        for useCache in [lambda obj: True, getState, lambda obj: False]:
+            self.speakLines(useCache)
+        recordCount = recording.stopRecording()
+        self.assertEqual(recordCount, 3 * len(LINES))
+        lines = recording.replay(recording.recordingFileName)
+        self.assertIn("0 records differ from recorded output", lines[-1])
+
+class ForeignCallbackCommand(speech.commands.BaseCallbackCommand):
+    def run(self):
+        pass
+
+    def __repr__(self):
+        return "ForeignCallbackCommand()"
+
+class RecordingFormatTest(RecordingTest):
+    def replayFile(self, records):
+        with gzip.open(recording.recordingFileName, "wt", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        return recording.replay(recording.recordingFileName)
+
+    def testReplayRebuildsEarcons(self):
+        earcon = pp.AudioRule(
+            comment="",
+            pattern="",
+            ruleType=pp.audioRuleBuiltInWave,
+            builtInWavFile=os.path.join("punctuation", "LeftBracket.wav"),
+            frenzyType=pp.FrenzyType.ROLE,
+            frenzyValue=controlTypes.Role.LIST.name,
+        ).speechCommand
+        beep = pp.PpBeepCommand(500, 50)
+        recording.startRecording()
+        speech.speech.speak([earcon, "Hello world", beep, speech.commands.PitchCommand(offset=10), "Bye", speech.commands.PitchCommand()])
+        speech.speech.speak([ForeignCallbackCommand(), "Hello", earcon])
+        self.assertEqual(recording.stopRecording(), 2)
+        records = list(recording.readRecords(recording.recordingFileName))
+        self.assertEqual(records[0]["input"][0], {recording.TAG_EARCON: [recording.EARCON_WAVE, earcon.fileName, 0, 0, 100]})
+        self.assertEqual(records[1]["input"][0], {recording.TAG_PLACEHOLDER: "ForeignCallbackCommand()"})
+        self.assertTrue(any("PpChainCommand" in command for command in records[0]["expected"]))
+        lines = recording.replay(recording.recordingFileName)
+        self.assertIn("0 records differ from recorded output", lines[-1])
+
+    def testUnknownClassesAreNotBuilt(self):
+        recording.startRecording()
+        speech.speech.speak(["Hello"])
+        recording.stopRecording()
+        record, = recording.readRecords(recording.recordingFileName)
+        record["input"] = [{recording.TAG_COMMAND: ["subprocess", "Popen", {"args": "echo"}]}]
+        lines = self.replayFile([record])
+        self.assertIn("    1 records differ from recorded output", lines)
+        self.assertIn("cannot be replayed", lines[-1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+# -*- coding: UTF-8 -*-
+#A part of the Earcons and Speech Rules addon for NVDA
+#Copyright (C) 2019-2023 Tony Malykh
+#This file is covered by the GNU General Public License.
+#See the file COPYING.txt for more details.
+
+import types
+import unittest
+from benchmarks import environment
+
+addon = environment.loadAddon()
+utils = addon.utils
+import config
+
+def makeFocus(appName):
+    return types.SimpleNamespace(appModule=types.SimpleNamespace(appName=appName))
+
+class BlacklistTest(unittest.TestCase):
+    def tearDown(self):
+        utils.setApplicationsBlacklist("")
+        utils.invalidateEnabledState()
+
+    def testNamesAreStripped(self):
+        utils.setApplicationsBlacklist("notepad, WinWord ,")
+        self.assertTrue(utils.isAppBlacklisted(makeFocus("winword")))
+        self.assertTrue(utils.isAppBlacklisted(makeFocus("Notepad")))
+        self.assertFalse(utils.isAppBlacklisted(makeFocus("word")))
+        self.assertFalse(utils.isAppBlacklisted(makeFocus("")))
+
+    def testBlacklistIsParsedOnlyWhenConfigChanges(self):
+        utils.setApplicationsBlacklist("notepad")
+        blacklist = utils.getApplicationsBlacklist()
+        self.assertIsInstance(blacklist, frozenset)
+        self.assertIs(utils.getApplicationsBlacklist(), blacklist)
+        # Profile switch
+        config.conf["phoneticpunctuation"]["applicationsBlacklist"] = "slack"
+        utils.invalidateEnabledState()
+        self.assertEqual(utils.getApplicationsBlacklist(), frozenset(["slack"]))
+
+if __name__ == "__main__":
+    unittest.main()